@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv('environment.env')
+
+# collect the API calls metrics, the overhead is a flag check for each API call if disabled
+API_METRICS = os.getenv('API_METRICS', 'True').lower() == 'true'
+# optional Prometheus textfile collector file path, for the API calls metrics
+API_METRICS_PROMETHEUS = os.getenv('API_METRICS_PROMETHEUS')
+# optional Chrome trace JSON file path, timeline of all API calls, open with chrome://tracing or Perfetto
+API_METRICS_TRACE = os.getenv('API_METRICS_TRACE')
+
+if API_METRICS_PROMETHEUS:
+    API_METRICS_PROMETHEUS = os.path.abspath(API_METRICS_PROMETHEUS)
+if API_METRICS_TRACE:
+    API_METRICS_TRACE = os.path.abspath(API_METRICS_TRACE)
+
+# latency histogram buckets upper bounds, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+class ApiMetrics:
+    """
+    This class will collect the API calls metrics for each endpoint: calls count, response bytes, errors, retries,
+    latency histogram, and optionally the calls timeline
+    """
+
+    def __init__(self, trace=False):
+        """
+        :param trace: True to keep the calls timeline, for the Chrome trace file
+        """
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.trace = trace
+        self.trace_events = []
+        self.start_time = time.monotonic()
+
+    def record(self, endpoint, start_time, latency, size=0, error=False, retry=False):
+        """
+        This method will record an API call
+        :param endpoint: endpoint name
+        :param start_time: call start time, time.monotonic()
+        :param latency: call latency, seconds
+        :param size: response size, bytes
+        :param error: True if the call failed
+        :param retry: True if the call is a retry
+        :return:
+        """
+        bucket = 0
+        while latency > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = {'count': 0, 'bytes': 0, 'errors': 0, 'retries': 0, 'latency_sum': 0,
+                           'buckets': [0] * len(LATENCY_BUCKETS)}
+                self.endpoints[endpoint] = metrics
+            metrics['count'] += 1
+            metrics['bytes'] += size
+            metrics['errors'] += int(error)
+            metrics['retries'] += int(retry)
+            metrics['latency_sum'] += latency
+            metrics['buckets'][bucket] += 1
+            if self.trace:
+                self.trace_events.append({'name': endpoint, 'cat': endpoint.split('.')[0], 'ph': 'X',
+                                          'ts': int((start_time - self.start_time) * 1000000),
+                                          'dur': int(latency * 1000000), 'pid': os.getpid(),
+                                          'tid': threading.get_ident(),
+                                          'args': {'bytes': size, 'error': error, 'retry': retry}})
+
+    def get_endpoints(self):
+        """
+        This method will return a copy of the metrics for each endpoint, example to be merged in the main process
+        :return: {endpoint: metrics}
+        """
+        with self.lock:
+            return json.loads(json.dumps(self.endpoints))
+
+    def get_trace_events(self):
+        """
+        This method will return a copy of the calls timeline, example to be merged in the main process. The events
+        time is the time.monotonic() time, the same clock for all the processes
+        :return: list of trace events
+        """
+        offset = int(self.start_time * 1000000)
+        with self.lock:
+            return [dict(event, ts=event['ts'] + offset) for event in self.trace_events]
+
+    def merge(self, endpoints, trace_events=()):
+        """
+        This method will add the metrics collected by another process
+        :param endpoints: {endpoint: metrics}, as returned by get_endpoints
+        :param trace_events: calls timeline, as returned by get_trace_events
+        :return:
+        """
+        offset = int(self.start_time * 1000000)
+        with self.lock:
+            if self.trace:
+                self.trace_events.extend(dict(event, ts=event['ts'] - offset) for event in trace_events)
+            for endpoint, metrics in endpoints.items():
+                current = self.endpoints.setdefault(endpoint, {'count': 0, 'bytes': 0, 'errors': 0, 'retries': 0,
+                                                               'latency_sum': 0,
+                                                               'buckets': [0] * len(LATENCY_BUCKETS)})
+                for name in ('count', 'bytes', 'errors', 'retries', 'latency_sum'):
+                    current[name] += metrics[name]
+                current['buckets'] = [a + b for a, b in zip(current['buckets'], metrics['buckets'])]
+
+    def get_percentile(self, buckets, count, percentile):
+        """
+        This method will estimate a latency percentile from the histogram, linear interpolation within the bucket
+        :param buckets: histogram buckets counts
+        :param count: calls count
+        :param percentile: percentile, example 0.95
+        :return: latency, seconds
+        """
+        rank = percentile * count
+        cumulative = 0
+        for index, bucket_count in enumerate(buckets):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index else 0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) - 1 else lower * 2
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return 0
+
+    def get_report(self):
+        """
+        This method will return the metrics for each endpoint
+        :return: {endpoint: {'count', 'bytes', 'errors', 'retries', 'latency_avg', 'p50', 'p95', 'p99'}}
+        """
+        report = {}
+        with self.lock:
+            for endpoint, metrics in sorted(self.endpoints.items()):
+                report[endpoint] = {'count': metrics['count'], 'bytes': metrics['bytes'],
+                                    'errors': metrics['errors'], 'retries': metrics['retries'],
+                                    'latency_avg': round(metrics['latency_sum'] / metrics['count'], 4)}
+                for name, percentile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                    report[endpoint][name] = round(self.get_percentile(metrics['buckets'], metrics['count'],
+                                                                       percentile), 4)
+        return report
+
+    def save_prometheus(self, file_path):
+        """
+        This method will save the metrics in the Prometheus text format, for the node exporter textfile collector
+        :param file_path: file path, ".prom" extension
+        :return:
+        """
+        lines = ['# HELP api_calls_total API calls', '# TYPE api_calls_total counter']
+        endpoints = self.get_endpoints()
+        for endpoint, metrics in endpoints.items():
+            labels = '{endpoint="' + endpoint + '"}'
+            lines.append('api_calls_total' + labels + ' ' + str(metrics['count']))
+            lines.append('api_errors_total' + labels + ' ' + str(metrics['errors']))
+            lines.append('api_retries_total' + labels + ' ' + str(metrics['retries']))
+            lines.append('api_response_bytes_total' + labels + ' ' + str(metrics['bytes']))
+        lines += ['# HELP api_latency_seconds API calls latency', '# TYPE api_latency_seconds histogram']
+        for endpoint, metrics in endpoints.items():
+            cumulative = 0
+            for bucket, bucket_count in zip(LATENCY_BUCKETS, metrics['buckets']):
+                cumulative += bucket_count
+                bucket_label = '+Inf' if bucket == float('inf') else str(bucket)
+                lines.append('api_latency_seconds_bucket{endpoint="' + endpoint + '",le="' + bucket_label + '"} ' +
+                             str(cumulative))
+            lines.append('api_latency_seconds_sum{endpoint="' + endpoint + '"} ' + str(metrics['latency_sum']))
+            lines.append('api_latency_seconds_count{endpoint="' + endpoint + '"} ' + str(metrics['count']))
+        temp_file = file_path + '.tmp'
+        with open(temp_file, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_file, file_path)
+
+    def save_trace(self, file_path):
+        """
+        This method will save the API calls timeline in the Chrome trace event format
+        :param file_path: file path
+        :return:
+        """
+        with self.lock:
+            trace_events = list(self.trace_events)
+        with open(file_path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+# API calls metrics for this run
+api_metrics = ApiMetrics(trace=bool(API_METRICS_TRACE))
+
+# response bytes for the current API call, for each thread
+thread_data = threading.local()
+
+
+def record(endpoint, start_time, latency, size=0, error=False, retry=False):
+    """
+    This function will record an API call, if the metrics are enabled, see ApiMetrics.record
+    """
+    if API_METRICS:
+        api_metrics.record(endpoint, start_time, latency, size, error, retry)
+
+
+def get_response_size(response, stream=False):
+    """
+    This function will return the response size: the content bytes received, the Content-Length header is missing
+    for the chunked responses and it is the compressed size for the compressed responses. The content of a streamed
+    response is not read, the Content-Length header is used
+    :param response: requests response
+    :param stream: True if the response is streamed
+    :return: bytes
+    """
+    if stream:
+        return int(response.headers.get('Content-Length') or 0)
+    return len(response.content)
+
+
+def response_hook(response, *args, **kwargs):
+    """
+    This function is a requests response hook, it will add the response size to the current thread API call bytes
+    :param response: requests response
+    :param kwargs: request options, example stream
+    :return:
+    """
+    if API_METRICS:
+        thread_data.bytes = getattr(thread_data, 'bytes', 0) + get_response_size(response, kwargs.get('stream'))
+
+
+def get_response_bytes():
+    """
+    This function will return and reset the response bytes collected by the response hook for the current thread
+    :return: bytes
+    """
+    size = getattr(thread_data, 'bytes', 0)
+    thread_data.bytes = 0
+    return size
+
+
+def get_report_lines():
+    """
+    This function will return the API calls metrics formatted for the run report
+    :return: list of report lines
+    """
+    lines = []
+    for endpoint, metrics in api_metrics.get_report().items():
+        lines.append('    API ' + endpoint + ': calls ' + str(metrics['count']) + ', errors ' +
+                     str(metrics['errors']) + ', retries ' + str(metrics['retries']) + ', bytes ' +
+                     str(metrics['bytes']) + ', latency p50/p95/p99 ' + str(round(metrics['p50'] * 1000)) + '/' +
+                     str(round(metrics['p95'] * 1000)) + '/' + str(round(metrics['p99'] * 1000)) + ' ms')
+    return lines
+
+
+def save_metrics():
+    """
+    This function will save the Prometheus textfile and the Chrome trace file, if configured
+    :return:
+    """
+    if not API_METRICS:
+        return
+    if API_METRICS_PROMETHEUS:
+        api_metrics.save_prometheus(API_METRICS_PROMETHEUS)
+    if API_METRICS_TRACE:
+        api_metrics.save_trace(API_METRICS_TRACE)
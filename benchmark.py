@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import benchmark_mock_server
+
+REPO_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# benchmark scenarios: the app to run and the mock configuration
+SCENARIOS = {
+    'network_state_100': {'app': 'catalyst_center_network_state_sync', 'config': {'devices': 100}},
+    'network_state_5000': {'app': 'catalyst_center_network_state_sync',
+                           'config': {'devices': 5000, 'areas': 5, 'buildings': 5, 'floors': 4}},
+    'network_state_50000': {'app': 'catalyst_center_network_state_sync',
+                            'config': {'devices': 50000, 'areas': 10, 'buildings': 10, 'floors': 5}},
+    'network_state_5000_throttled': {'app': 'catalyst_center_network_state_sync',
+                                     'config': {'devices': 5000, 'areas': 5, 'buildings': 5, 'floors': 4,
+                                                'throttle_rate': {'*': 0.02}}},
+    'templates_50': {'app': 'catalyst_center_github_sync', 'config': {'templates': 50}},
+    'templates_500': {'app': 'catalyst_center_github_sync', 'config': {'templates': 500}}
+}
+
+# scenarios run by default, the 50,000 devices scenario is run only when selected
+DEFAULT_SCENARIOS = ['network_state_100', 'network_state_5000', 'templates_50']
+
+
+def run_app(app):
+    """
+    This function will run the app main() in this process, it is called in a child process for each scenario
+    :param app: app module name
+    :return: {'wall_time': seconds, 'peak_memory_kb': maximum resident set size}
+    """
+    sys.path.insert(0, REPO_PATH)
+    module = importlib.import_module(app)
+    start_time = time.perf_counter()
+    module.main()
+    wall_time = time.perf_counter() - start_time
+    return {'wall_time': round(wall_time, 3), 'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def run_scenario(name, scenario):
+    """
+    This function will start the mock server for the scenario and run the app in a child process, with the
+    environment pointing to the mock server and an empty working folder
+    :param name: scenario name
+    :param scenario: {'app', 'config'}
+    :return: scenario results: wall time, peak memory, API calls, bytes and throttled calls by endpoint
+    """
+    server = benchmark_mock_server.start_server(scenario['config'])
+    state = server.RequestHandlerClass.state
+    server_url = 'http://127.0.0.1:' + str(server.server_port)
+    with tempfile.TemporaryDirectory() as work_path:
+        env = dict(os.environ,
+                   CATALYST_CENTER_URL=server_url, CATALYST_CENTER_USER='benchmark',
+                   CATALYST_CENTER_PASS='benchmark', CATALYST_CENTER_PROJECT=state.config['project'],
+                   GITHUB_URL=server_url, GITHUB_USERNAME=state.config['github_username'], GITHUB_TOKEN='benchmark',
+                   GITHUB_REPO=state.config['github_templates_repo'],
+                   GITHUB_NETWORK_STATE_REPO=state.config['github_network_state_repo'],
+                   GITHUB_CACHE_PATH=os.path.join(work_path, '.github_cache'),
+                   DEVICE_CACHE_PATH=os.path.join(work_path, '.device_cache'))
+        env.pop('GITHUB_MIRROR_PATH', None)
+        process = subprocess.run([sys.executable, os.path.join(REPO_PATH, 'benchmark.py'), '--child',
+                                  scenario['app']], cwd=work_path, env=env, capture_output=True, text=True)
+    with urllib.request.urlopen(server_url + '/__stats') as response:
+        stats = json.loads(response.read())
+    server.shutdown()
+    server.server_close()
+    if process.returncode != 0:
+        return {'scenario': name, 'error': process.stderr[-2000:]}
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result.update({'scenario': name, 'app': scenario['app'],
+                   'api_calls': sum(endpoint['calls'] for endpoint in stats.values()),
+                   'api_bytes': sum(endpoint['bytes'] for endpoint in stats.values()),
+                   'throttled_calls': sum(endpoint['throttled'] for endpoint in stats.values()),
+                   'endpoints': stats})
+    return result
+
+
+def compare_results(results, baseline_results, tolerance):
+    """
+    This function will compare the results with a baseline, a regression is a wall time, API calls or peak memory
+    increase over the tolerance
+    :param results: benchmark results
+    :param baseline_results: baseline benchmark results
+    :param tolerance: allowed increase, example 0.2 for 20%
+    :return: list of regressions
+    """
+    baseline = {result['scenario']: result for result in baseline_results if 'error' not in result}
+    regressions = []
+    for result in results:
+        if 'error' in result:
+            regressions.append(result['scenario'] + ': failed')
+            continue
+        if result['scenario'] not in baseline:
+            continue
+        for metric in ('wall_time', 'api_calls', 'peak_memory_kb'):
+            baseline_value = baseline[result['scenario']][metric]
+            if baseline_value and result[metric] > baseline_value * (1 + tolerance):
+                regressions.append(result['scenario'] + ': ' + metric + ' ' + str(result[metric]) +
+                                   ', baseline ' + str(baseline_value))
+    return regressions
+
+
+def main():
+    """
+    This app will benchmark the apps with a local mock of the Catalyst Center and GitHub APIs, no controller or GitHub
+    account needed. For each scenario it will report the wall time, the API calls and the peak memory.
+    It may be part of a CI pipeline, with a baseline results file to detect performance regressions.
+    """
+    parser = argparse.ArgumentParser(description='Catalyst Center and GitHub sync apps benchmark')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run, may be repeated, default ' + ', '.join(DEFAULT_SCENARIOS))
+    parser.add_argument('--output', default='benchmark_results.json', help='results file')
+    parser.add_argument('--baseline', help='baseline results file, exit code 1 for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed increase over the baseline')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_app(args.child)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for name in args.scenario or DEFAULT_SCENARIOS:
+        result = run_scenario(name, SCENARIOS[name])
+        results.append(result)
+        if 'error' in result:
+            print(name + ': failed\n' + result['error'])
+        else:
+            print(name + ': wall time ' + str(result['wall_time']) + ' seconds, API calls ' +
+                  str(result['api_calls']) + ', throttled ' + str(result['throttled_calls']) + ', peak memory ' +
+                  str(result['peak_memory_kb']) + ' KB')
+
+    with open(args.output, 'w') as f:
+        f.write(json.dumps(results, indent=4))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
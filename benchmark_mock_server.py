@@ -0,0 +1,584 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# default mock configuration, the counts, latency and throttling may be changed for each benchmark scenario
+DEFAULT_CONFIG = {
+    'devices': 100,  # number of devices, including the access points
+    'ap_ratio': 0.3,  # part of the devices that are access points
+    'fabric_ratio': 0.2,  # part of the devices with SDA fabric roles
+    'areas': 2,  # number of areas, each with buildings and floors
+    'buildings': 2,  # number of buildings per area
+    'floors': 3,  # number of floors per building
+    'templates': 10,  # number of templates in the GitHub templates repo
+    'latency': 0.005,  # default API latency, seconds
+    'jitter': 0.002,  # default API latency jitter, seconds
+    'endpoint_latency': {},  # {endpoint: [latency, jitter]}
+    'throttle_rate': {},  # {endpoint: probability of a 429 response}, "*" for all endpoints
+    'task_time': 0.05,  # time for a Catalyst Center task to complete, seconds
+    'github_username': 'benchmark',
+    'github_templates_repo': 'templates',
+    'github_network_state_repo': 'network_state',
+    'project': 'Benchmark_Project'
+}
+
+
+def get_sha(data):
+    """
+    This function will return a SHA-1 for mock object ids
+    :param data: data to hash, str or bytes
+    :return: SHA-1 hex digest
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_blob_sha(content):
+    """
+    This function will return the git blob SHA for the content
+    :param content: bytes
+    :return: blob SHA
+    """
+    return get_sha(b'blob ' + str(len(content)).encode() + b'\0' + content)
+
+
+class MockState:
+    """
+    This class will keep the mock Catalyst Center and GitHub data and the API call statistics.
+    The devices are generated from their index when requested, the memory use is independent of the number of devices
+    """
+
+    def __init__(self, config):
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.random = random.Random(0)
+
+        # site hierarchy, sorted as Catalyst Center returns it
+        self.sites = [{'id': 'site-global', 'name': 'Global', 'siteNameHierarchy': 'Global'}]
+        self.floors = []
+        for area in range(self.config['areas']):
+            area_name = 'Global/Area ' + str(area)
+            self.sites.append({'id': 'site-a' + str(area), 'name': 'Area ' + str(area),
+                               'siteNameHierarchy': area_name})
+            for building in range(self.config['buildings']):
+                building_name = area_name + '/Building ' + str(building)
+                self.sites.append({'id': 'site-a' + str(area) + '-b' + str(building),
+                                   'name': 'Building ' + str(building), 'siteNameHierarchy': building_name})
+                for floor in range(self.config['floors']):
+                    floor_site = {'id': 'site-a' + str(area) + '-b' + str(building) + '-f' + str(floor),
+                                  'name': 'Floor ' + str(floor),
+                                  'siteNameHierarchy': building_name + '/Floor ' + str(floor)}
+                    self.sites.append(floor_site)
+                    self.floors.append(floor_site)
+        self.sites_by_id = {site['id']: site for site in self.sites}
+        self.floor_index = {site['id']: index for index, site in enumerate(self.floors)}
+
+        # template projects and tasks
+        self.projects = {}
+        self.templates = {}
+        self.tasks = {}
+
+        # GitHub repos: blobs, trees and commits
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.repos = {self.config['github_templates_repo']: {'head': None, 'order': []},
+                      self.config['github_network_state_repo']: {'head': None, 'order': []}}
+        for index in range(self.config['templates']):
+            file_name = 'template_' + str(index).zfill(4) + '.txt'
+            content = '!\nhostname {{ hostname }}\nlogging buffered ' + str(4096 + index) + '\n!\n'
+            self.add_commit(self.config['github_templates_repo'], {file_name: content.encode()},
+                            'add ' + file_name)
+        self.add_commit(self.config['github_network_state_repo'], {'README.md': b'network state\n'}, 'init')
+
+    def record(self, endpoint, size, throttled=False):
+        with self.lock:
+            endpoint_stats = self.stats.setdefault(endpoint, {'calls': 0, 'bytes': 0, 'throttled': 0})
+            endpoint_stats['calls'] += 1
+            endpoint_stats['bytes'] += size
+            endpoint_stats['throttled'] += int(throttled)
+
+    def get_stats(self, reset=False):
+        with self.lock:
+            stats = self.stats
+            if reset:
+                self.stats = {}
+            return json.loads(json.dumps(stats))
+
+    def get_latency(self, endpoint):
+        latency, jitter = self.config['endpoint_latency'].get(endpoint,
+                                                              [self.config['latency'], self.config['jitter']])
+        with self.lock:
+            return max(latency + self.random.uniform(-jitter, jitter), 0)
+
+    def is_throttled(self, endpoint):
+        rate = self.config['throttle_rate'].get(endpoint, self.config['throttle_rate'].get('*', 0))
+        with self.lock:
+            return self.random.random() < rate
+
+    # Catalyst Center data
+
+    def get_device(self, index):
+        is_ap = index % 10 < self.config['ap_ratio'] * 10
+        return {'id': 'device-' + str(index).zfill(6),
+                'hostname': ('AP' if is_ap else 'SW') + str(index).zfill(6),
+                'managementIpAddress': '10.' + str(index // 65536 % 256) + '.' + str(index // 256 % 256) + '.' +
+                                       str(index % 256),
+                'softwareVersion': '17.9.4',
+                'type': 'Cisco Catalyst 9130AXI Unified Access Point' if is_ap else 'Cisco Catalyst 9300 Switch',
+                'family': 'Unified AP' if is_ap else 'Switches and Hubs',
+                'role': 'ACCESS',
+                'lastUpdateTime': 1700000000000,
+                'lastUpdated': '2023-11-14 22:13:20'}
+
+    def get_device_site(self, index):
+        return self.floors[index % len(self.floors)]
+
+    def get_device_index(self, device_id=None, ip_address=None):
+        if device_id:
+            return int(device_id.split('-')[1])
+        octets = [int(octet) for octet in ip_address.split('.')]
+        return octets[1] * 65536 + octets[2] * 256 + octets[3]
+
+    def get_network_settings(self, site_name_hierarchy):
+        settings = [{'key': 'dns.server', 'value': [{'domainName': 'example.com', 'primaryIpAddress': '10.0.0.53'}]},
+                    {'key': 'ntp.server', 'value': ['10.0.0.123']},
+                    {'key': 'syslog.server', 'value': [{'ipAddresses': ['10.0.0.514']}]}]
+        if site_name_hierarchy.count('/') >= 1:
+            # area level override
+            area = site_name_hierarchy.split('/')[1]
+            settings[1] = {'key': 'ntp.server', 'value': ['10.' + area.split()[-1] + '.0.123']}
+        return settings
+
+    def create_task(self, data=None, is_error=False, failure_reason=None):
+        task_id = 'task-' + get_sha(str(time.time()) + str(random.random()))[:12]
+        with self.lock:
+            self.tasks[task_id] = {'ready': time.monotonic() + self.config['task_time'], 'data': data,
+                                   'isError': is_error, 'failureReason': failure_reason}
+        return task_id
+
+    # GitHub data
+
+    def add_commit(self, repo_name, files, message, tree_sha=None):
+        repo = self.repos[repo_name]
+        parent = repo['head']
+        tree = dict(self.trees[self.commits[parent]['tree']]) if parent else {}
+        commit_files = []
+        for path, content in files.items():
+            blob_sha = get_blob_sha(content)
+            self.blobs[blob_sha] = content
+            tree[path] = blob_sha
+            patch = '@@ -0,0 +1,' + str(content.count(b'\n')) + ' @@\n' + '\n'.join(
+                '+' + line for line in content.decode(errors='replace').splitlines())
+            commit_files.append({'filename': path, 'patch': patch})
+        if tree_sha is None:
+            tree_sha = get_sha(json.dumps(tree, sort_keys=True))
+            self.trees[tree_sha] = tree
+        commit_sha = get_sha(json.dumps([parent, tree_sha, message, time.time(), random.random()]))
+        self.commits[commit_sha] = {'tree': tree_sha, 'message': message, 'files': commit_files,
+                                    'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        repo['head'] = commit_sha
+        repo['order'].insert(0, commit_sha)
+        return commit_sha
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    This class will handle the mock API requests, for the Catalyst Center and GitHub APIs used by the apps
+    """
+    protocol_version = 'HTTP/1.1'
+    state = None
+    routes = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method):
+        parsed_url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(parsed_url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        payload = json.loads(body) if body else None
+
+        if parsed_url.path == '/__stats':
+            return self.send_json(200, self.state.get_stats(reset=query.get('reset') == 'true'))
+
+        for route_method, pattern, endpoint, handler in self.routes:
+            match = pattern.fullmatch(parsed_url.path)
+            if route_method == method and match:
+                break
+        else:
+            self.state.record('unknown ' + method + ' ' + parsed_url.path, 0)
+            return self.send_json(404, {'message': 'Not Found'})
+
+        time.sleep(self.state.get_latency(endpoint))
+        if self.state.is_throttled(endpoint):
+            self.state.record(endpoint, 0, throttled=True)
+            return self.send_json(429, {'message': 'Too Many Requests'}, {'Retry-After': '1'})
+        result = handler(self.state, match, query, payload)
+        status, response = result[0], result[1]
+        headers = result[2] if len(result) > 2 else {}
+        size = self.send_json(status, response, headers, endpoint.startswith('github.') and method == 'GET')
+        self.state.record(endpoint, size)
+
+    def send_json(self, status, response, headers=None, etag=False):
+        if isinstance(response, bytes):
+            body = response
+            content_type = 'application/octet-stream'
+        else:
+            body = json.dumps(response).encode()
+            content_type = 'application/json'
+        headers = dict(headers or {})
+        if etag and status == 200:
+            headers['ETag'] = '"' + get_sha(body) + '"'
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                status = 304
+                body = b''
+        headers.update({'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4999',
+                        'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+
+def route(method, path, endpoint):
+    """
+    This function will register a mock API handler
+    :param method: HTTP method
+    :param path: path regular expression
+    :param endpoint: endpoint name, used for the statistics, the latency and the throttling configuration
+    :return: decorator
+    """
+    def register(handler):
+        MockHandler.routes.append((method, re.compile(path), endpoint, handler))
+        return handler
+    return register
+
+
+def get_page(items, query, one_based=True):
+    offset = int(query.get('offset', 1 if one_based else 0)) - (1 if one_based else 0)
+    limit = int(query.get('limit', 500))
+    return items[offset:offset + limit]
+
+
+# Catalyst Center API
+
+@route('POST', '/dna/system/api/v1/auth/token', 'cc.authentication')
+def cc_authentication(state, match, query, payload):
+    return 200, {'Token': 'benchmark-token'}
+
+
+@route('GET', '/dna/intent/api/v1/network-device/count', 'cc.get_device_count')
+def cc_get_device_count(state, match, query, payload):
+    return 200, {'response': state.config['devices'], 'version': '1.0'}
+
+
+@route('GET', '/dna/intent/api/v1/network-device', 'cc.get_device_list')
+def cc_get_device_list(state, match, query, payload):
+    indexes = get_page(range(state.config['devices']), query)
+    return 200, {'response': [state.get_device(index) for index in indexes], 'version': '1.0'}
+
+
+@route('GET', '/dna/intent/api/v1/device-detail', 'cc.get_device_detail')
+def cc_get_device_detail(state, match, query, payload):
+    index = state.get_device_index(device_id=query.get('searchBy'))
+    return 200, {'response': {'location': state.get_device_site(index)['siteNameHierarchy']}}
+
+
+@route('GET', '/dna/intent/api/v1/business/sda/device/role', 'cc.get_device_role_in_sda_fabric')
+def cc_get_device_role_in_sda_fabric(state, match, query, payload):
+    index = state.get_device_index(ip_address=query.get('deviceManagementIpAddress'))
+    if index % 10 < state.config['fabric_ratio'] * 10:
+        return 200, {'roles': ['EDGENODE'], 'status': 'success', 'description': 'Device role'}
+    return 400, {'status': 'failed', 'description': 'Device is not provisioned to any fabric'}
+
+
+@route('GET', '/dna/intent/api/v1/site/count', 'cc.get_site_count')
+def cc_get_site_count(state, match, query, payload):
+    return 200, {'response': len(state.sites), 'version': '1.0'}
+
+
+@route('GET', '/dna/intent/api/v1/site', 'cc.get_site')
+def cc_get_site(state, match, query, payload):
+    if query.get('name'):
+        sites = [site for site in state.sites if site['siteNameHierarchy'] == query['name']]
+    else:
+        sites = get_page(state.sites, query)
+    return 200, {'response': sites}
+
+
+@route('GET', '/dna/intent/api/v1/membership/(?P<site_id>[^/]+)', 'cc.get_membership')
+def cc_get_membership(state, match, query, payload):
+    site_id = match.group('site_id')
+    devices = []
+    if site_id in state.floor_index:
+        indexes = range(state.floor_index[site_id], state.config['devices'], len(state.floors))
+        devices = [dict(state.get_device(index), instanceUuid=state.get_device(index)['id'])
+                   for index in get_page(indexes, query)]
+    return 200, {'site': {'response': [], 'version': '1.0'},
+                 'device': [{'response': devices, 'version': '1.0', 'siteId': site_id}]}
+
+
+@route('GET', '/dna/intent/api/v2/network', 'cc.get_network_v2')
+def cc_get_network_v2(state, match, query, payload):
+    site = state.sites_by_id[query['siteId']]
+    return 200, {'response': state.get_network_settings(site['siteNameHierarchy']), 'version': '1.0'}
+
+
+@route('GET', '/dna/intent/api/v1/task/(?P<task_id>[^/]+)', 'cc.get_task_by_id')
+def cc_get_task_by_id(state, match, query, payload):
+    task = state.tasks.get(match.group('task_id'))
+    if task is None:
+        return 404, {'response': {'errorCode': 'NotFound'}}
+    task_info = {'id': match.group('task_id'), 'isError': task['isError'], 'progress': 'In progress',
+                 'startTime': 0}
+    if time.monotonic() >= task['ready']:
+        task_info.update({'endTime': int(time.time() * 1000), 'progress': 'Successful', 'data': task['data']})
+        if task['isError']:
+            task_info['failureReason'] = task['failureReason']
+    return 200, {'response': task_info, 'version': '1.0'}
+
+
+@route('GET', '/dna/intent/api/v1/template-programmer/project', 'cc.get_projects')
+def cc_get_projects(state, match, query, payload):
+    projects = [project for project in state.projects.values() if project['name'] == query.get('name')]
+    for project in projects:
+        project['templates'] = [{'name': template['name'], 'id': template['id']}
+                                for template in state.templates.values() if template['projectId'] == project['id']]
+    return 200, projects
+
+
+@route('POST', '/dna/intent/api/v1/template-programmer/project', 'cc.create_project')
+def cc_create_project(state, match, query, payload):
+    project_id = 'project-' + get_sha(payload['name'])[:12]
+    state.projects[project_id] = {'name': payload['name'], 'id': project_id, 'templates': []}
+    return 202, {'response': {'taskId': state.create_task(project_id), 'url': '/api/v1/task/'}, 'version': '1.0'}
+
+
+@route('GET', '/dna/intent/api/v2/template-programmer/template', 'cc.get_templates_details')
+def cc_get_templates_details(state, match, query, payload):
+    templates = [template for template in state.templates.values()
+                 if template['projectId'] == query.get('projectId') and
+                 (not query.get('name') or template['name'] == query['name'])]
+    return 200, {'response': get_page(templates, query), 'version': '1.0'}
+
+
+@route('POST', '/dna/intent/api/v1/template-programmer/project/(?P<project_id>[^/]+)/template',
+       'cc.create_template')
+def cc_create_template(state, match, query, payload):
+    template_id = 'template-' + get_sha(match.group('project_id') + payload['name'])[:12]
+    state.templates[template_id] = {'name': payload['name'], 'id': template_id,
+                                    'projectId': match.group('project_id'),
+                                    'templateContent': payload['templateContent']}
+    return 202, {'response': {'taskId': state.create_task(template_id), 'url': '/api/v1/task/'}, 'version': '1.0'}
+
+
+@route('PUT', '/dna/intent/api/v1/template-programmer/template', 'cc.update_template')
+def cc_update_template(state, match, query, payload):
+    state.templates[payload['id']]['templateContent'] = payload['templateContent']
+    return 202, {'response': {'taskId': state.create_task(payload['id']), 'url': '/api/v1/task/'}, 'version': '1.0'}
+
+
+@route('POST', '/dna/intent/api/v1/template-programmer/template/version', 'cc.version_template')
+def cc_version_template(state, match, query, payload):
+    return 202, {'response': {'taskId': state.create_task(payload['templateId']), 'url': '/api/v1/task/'},
+                 'version': '1.0'}
+
+
+# GitHub API
+
+@route('GET', '/users/(?P<username>[^/]+)/repos', 'github.get_repos')
+def github_get_repos(state, match, query, payload):
+    return 200, [{'name': repo_name} for repo_name in state.repos]
+
+
+@route('GET', '/user/repos', 'github.get_private_repos')
+def github_get_private_repos(state, match, query, payload):
+    return 200, [{'name': repo_name} for repo_name in state.repos]
+
+
+def get_repo(state, match):
+    return state.repos.get(match.group('repo'))
+
+
+@route('GET', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/trees/(?P<ref>[^/]+)', 'github.get_tree')
+def github_get_tree(state, match, query, payload):
+    repo = get_repo(state, match)
+    if repo is None:
+        return 404, {'message': 'Not Found'}
+    tree_sha = state.commits[repo['head']]['tree'] if match.group('ref') == 'main' else match.group('ref')
+    tree = [{'path': path, 'mode': '100644', 'type': 'blob', 'sha': sha, 'size': len(state.blobs[sha])}
+            for path, sha in sorted(state.trees[tree_sha].items())]
+    return 200, {'sha': tree_sha, 'tree': tree, 'truncated': False}
+
+
+@route('GET', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/contents/(?P<path>.+)', 'github.get_contents')
+def github_get_contents(state, match, query, payload):
+    repo = get_repo(state, match)
+    tree = state.trees[state.commits[repo['head']]['tree']]
+    blob_sha = tree.get(match.group('path'))
+    if blob_sha is None:
+        return 404, {'message': 'Not Found'}
+    return 200, {'name': match.group('path').split('/')[-1], 'path': match.group('path'), 'sha': blob_sha,
+                 'encoding': 'base64', 'content': base64.b64encode(state.blobs[blob_sha]).decode()}
+
+
+@route('GET', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/commits', 'github.get_commits')
+def github_get_commits(state, match, query, payload):
+    repo = get_repo(state, match)
+    per_page = int(query.get('per_page', 30))
+    page = int(query.get('page', 1))
+    commits = repo['order'][(page - 1) * per_page:page * per_page]
+    headers = {}
+    if page * per_page < len(repo['order']):
+        url = ('http://' + state.config['host'] + '/repos/' + match.group('owner') + '/' + match.group('repo') +
+               '/commits?per_page=' + str(per_page) + '&page=' + str(page + 1))
+        headers['Link'] = '<' + url + '>; rel="next"'
+    return 200, [{'sha': sha} for sha in commits], headers
+
+
+@route('GET', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/commits/(?P<sha>[0-9a-f]+)', 'github.get_commit')
+def github_get_commit(state, match, query, payload):
+    commit = state.commits.get(match.group('sha'))
+    if commit is None:
+        return 404, {'message': 'Not Found'}
+    return 200, {'sha': match.group('sha'),
+                 'commit': {'author': {'email': 'benchmark@example.com', 'date': commit['date']},
+                            'message': commit['message']},
+                 'html_url': 'https://github.com/' + match.group('owner') + '/' + match.group('repo') + '/commit/' +
+                             match.group('sha'),
+                 'files': commit['files']}
+
+
+@route('GET', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/branches/(?P<branch>[^/]+)', 'github.get_branch')
+def github_get_branch(state, match, query, payload):
+    repo = get_repo(state, match)
+    return 200, {'name': match.group('branch'),
+                 'commit': {'sha': repo['head'], 'commit': {'tree': {'sha': state.commits[repo['head']]['tree']}}}}
+
+
+@route('GET', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/blobs/(?P<sha>[0-9a-f]+)', 'github.get_blob')
+def github_get_blob(state, match, query, payload):
+    return 200, state.blobs[match.group('sha')]
+
+
+@route('POST', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/blobs', 'github.create_blob')
+def github_create_blob(state, match, query, payload):
+    content = base64.b64decode(payload['content'])
+    blob_sha = get_blob_sha(content)
+    state.blobs[blob_sha] = content
+    return 201, {'sha': blob_sha}
+
+
+@route('POST', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/trees', 'github.create_tree')
+def github_create_tree(state, match, query, payload):
+    tree = dict(state.trees.get(payload.get('base_tree'), {}))
+    for item in payload['tree']:
+        if item['sha'] is None:
+            tree.pop(item['path'], None)
+        else:
+            tree[item['path']] = item['sha']
+    tree_sha = get_sha(json.dumps(tree, sort_keys=True))
+    state.trees[tree_sha] = tree
+    return 201, {'sha': tree_sha}
+
+
+@route('POST', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/commits', 'github.create_commit')
+def github_create_commit(state, match, query, payload):
+    commit_sha = get_sha(json.dumps([payload['parents'], payload['tree'], payload['message'], time.time()]))
+    state.commits[commit_sha] = {'tree': payload['tree'], 'message': payload['message'], 'files': [],
+                                 'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+    return 201, {'sha': commit_sha}
+
+
+@route('PATCH', '/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/git/refs/heads/(?P<branch>[^/]+)', 'github.update_ref')
+def github_update_ref(state, match, query, payload):
+    repo = get_repo(state, match)
+    repo['head'] = payload['sha']
+    repo['order'].insert(0, payload['sha'])
+    return 200, {'ref': 'refs/heads/' + match.group('branch'), 'object': {'sha': payload['sha']}}
+
+
+def start_server(config, port=0):
+    """
+    This function will start the mock server in a background thread
+    :param config: mock configuration, see DEFAULT_CONFIG
+    :param port: TCP port, 0 for a free port
+    :return: server, the server URL is "http://127.0.0.1:" + str(server.server_port)
+    """
+    handler = type('ScenarioHandler', (MockHandler,), {'state': None})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    handler.state = MockState(dict(config, host='127.0.0.1:' + str(server.server_port)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """
+    This app will run the mock Catalyst Center and GitHub APIs, for the benchmark or for manual tests.
+    The API call statistics are available at /__stats, /__stats?reset=true will also reset them
+    """
+    parser = argparse.ArgumentParser(description='Mock Catalyst Center and GitHub APIs')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--config', help='JSON formatted mock configuration, see DEFAULT_CONFIG')
+    args = parser.parse_args()
+    server = start_server(json.loads(args.config) if args.config else {}, args.port)
+    print('Mock server running at http://127.0.0.1:' + str(server.server_port))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+import api_metrics
+
+load_dotenv('environment.env')
+
+# maximum time to wait for a Catalyst Center task to complete, seconds
+CATALYST_CENTER_TASK_TIMEOUT = float(os.getenv('CATALYST_CENTER_TASK_TIMEOUT', '60'))
+
+# maximum number of concurrent Catalyst Center API calls, the adaptive limit is between 1 and this value
+CATALYST_CENTER_WORKERS = int(os.getenv('CATALYST_CENTER_WORKERS', '10'))
+# number of retries for the throttled or failed Catalyst Center API calls
+CATALYST_CENTER_MAX_RETRIES = int(os.getenv('CATALYST_CENTER_MAX_RETRIES', '4'))
+
+# HTTP status codes for the transient errors, the API calls may be retried
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_error_status_code(error):
+    """
+    This function will return the HTTP status code for a Catalyst Center SDK exception
+    :param error: exception
+    :return: HTTP status code, None if not an HTTP error
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None and getattr(error, 'response', None) is not None:
+        status_code = getattr(error.response, 'status_code', None)
+    return status_code
+
+
+def is_transient_error(error):
+    """
+    This function will identify the transient errors: throttling, server errors, connection errors and timeouts.
+    The other errors are definitive answers, example 404 not found
+    :param error: exception
+    :return: True if transient error
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    return get_error_status_code(error) in TRANSIENT_STATUS_CODES
+
+
+def create_session():
+    """
+    This function will create the HTTP session for the Catalyst Center SDK, with the response hook used to collect
+    the API calls response bytes
+    :return: requests session
+    """
+    session = requests.Session()
+    session.hooks['response'].append(api_metrics.response_hook)
+    return session
+
+
+class AdaptiveLimiter:
+    """
+    This class will limit the number of concurrent API calls using AIMD: the limit is increased by one after a limit
+    number of fast calls, and decreased by a quarter, at most once a second, for throttled calls or calls with latency
+    over three times the lowest latency observed for the API. A few throttled calls reduce the limit gradually
+    """
+
+    def __init__(self, max_limit):
+        """
+        :param max_limit: maximum number of concurrent API calls
+        """
+        self.max_limit = max(max_limit, 1)
+        self.limit = max(self.max_limit / 2, 1)
+        self.in_flight = 0
+        self.min_latency = {}
+        self.decrease_time = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        This method will wait until an API call may be sent
+        :return:
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, endpoint, latency, throttled=False):
+        """
+        This method will release the API call and adjust the limit
+        :param endpoint: API name
+        :param latency: API call latency, seconds
+        :param throttled: True if the API call was throttled or failed with a transient error
+        :return:
+        """
+        with self.condition:
+            self.in_flight -= 1
+            min_latency = min(self.min_latency.get(endpoint, latency), latency)
+            self.min_latency[endpoint] = min_latency
+            overloaded = throttled or latency > max(min_latency * 3, 0.5)
+            now = time.monotonic()
+            if overloaded:
+                if now - self.decrease_time > 1:
+                    self.decrease_time = now
+                    self.limit = max(self.limit * 0.75, 1)
+                    logging.info(' Catalyst Center API concurrency limit decreased to ' + str(int(self.limit)))
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            self.condition.notify_all()
+
+
+class AdaptiveApi:
+    """
+    This class will wrap the Catalyst Center SDK "Connection Object", all API calls are limited by the adaptive
+    limiter. The idempotent API calls, "get_" functions, are retried for transient errors with jittered exponential
+    backoff, the other API calls are retried only when throttled.
+    The SDK must be created with wait_on_rate_limit=False, the throttling is handled by this class
+    """
+
+    def __init__(self, api, limiter=None, family=None):
+        """
+        :param api: DNACenterAPI object, or an API family, example api.devices
+        :param limiter: AdaptiveLimiter, default a new limiter for CATALYST_CENTER_WORKERS API calls
+        :param family: API family name, example "devices", used for the API calls metrics
+        """
+        self.api = api
+        self.limiter = limiter or AdaptiveLimiter(CATALYST_CENTER_WORKERS)
+        self.family = family
+
+    def __getattr__(self, name):
+        attribute = getattr(self.api, name)
+        if not callable(attribute):
+            # API family, example devices, sites
+            return AdaptiveApi(attribute, self.limiter, name)
+        endpoint = 'catalyst_center.' + (self.family + '.' if self.family else '') + name
+
+        def call_api(*args, **kwargs):
+            retry = 0
+            while True:
+                self.limiter.acquire()
+                api_metrics.get_response_bytes()
+                start_time = time.monotonic()
+                try:
+                    response = attribute(*args, **kwargs)
+                except Exception as error:
+                    latency = time.monotonic() - start_time
+                    api_metrics.record(endpoint, start_time, latency, api_metrics.get_response_bytes(), True,
+                                       retry > 0)
+                    transient = is_transient_error(error)
+                    self.limiter.release(name, latency, transient)
+                    retry_allowed = name.startswith('get_') or get_error_status_code(error) == 429
+                    if not transient or not retry_allowed or retry >= CATALYST_CENTER_MAX_RETRIES:
+                        raise
+                    retry += 1
+                    delay = random.uniform(0, min(2 ** retry, 30))
+                    logging.warning(' Catalyst Center API "' + name + '" error: ' + str(error) + ', retry in ' +
+                                    str(round(delay, 1)) + ' seconds')
+                    time.sleep(delay)
+                    continue
+                latency = time.monotonic() - start_time
+                api_metrics.record(endpoint, start_time, latency, api_metrics.get_response_bytes(), False, retry > 0)
+                self.limiter.release(name, latency)
+                return response
+
+        return call_api
+
+
+def ordered_map(function, iterable, workers, window=None):
+    """
+    This function will call the function for each item, using a pool of workers, and it will yield the results in
+    the items order. Unlike executor.map, the items are consumed as the results are yielded, at most a window of
+    results are pending, and the memory use is independent of the number of items.
+    A slow item, example an API call waiting to be retried, blocks the new items only when the window is full
+    :param function: function to call for each item
+    :param iterable: iterable of items, may be a generator
+    :param workers: number of workers
+    :param window: maximum number of pending results, default two per worker
+    :return: generator of results
+    """
+    window = window or workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_paged_items(api_function, item_count, workers, limit=500, key='id', **kwargs):
+    """
+    This function will return all the items from a paged Catalyst Center API. The page offsets are computed from the
+    items count and the pages are retrieved concurrently, the items are returned in the pages order.
+    Items moving between pages during the collection are returned once, and if the last page is full the following
+    pages are retrieved until a partial page, for items added during the collection
+    :param api_function: SDK function with offset and limit parameters, example devices.get_device_list
+    :param item_count: number of items, as returned by the count API
+    :param workers: number of concurrent API calls
+    :param limit: page size
+    :param key: item unique key, used to remove duplicates
+    :param kwargs: other API function parameters
+    :return: generator of items
+    """
+    def get_page(offset):
+        response = api_function(offset=offset, limit=limit, **kwargs)
+        return response['response'] or []
+
+    seen_keys = set()
+
+    def get_new_items(page):
+        new_items = [item for item in page if item[key] not in seen_keys]
+        seen_keys.update(item[key] for item in new_items)
+        return new_items
+
+    offsets = range(1, item_count + 1, limit)
+    page_size = limit
+    for page in ordered_map(get_page, offsets, workers):
+        page_size = len(page)
+        yield from get_new_items(page)
+
+    next_offset = len(offsets) * limit + 1
+    while page_size == limit:
+        page = get_page(next_offset)
+        page_size = len(page)
+        next_offset += limit
+        yield from get_new_items(page)
+
+
+def wait_for_task(catalyst_center_api, task_id, timeout=CATALYST_CENTER_TASK_TIMEOUT):
+    """
+    This function will poll the Catalyst Center task until completed, with exponential backoff between polls:
+    0.5 seconds first, doubled after each poll, up to 5 seconds
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param task_id: task id
+    :param timeout: maximum time to wait for the task to complete, seconds
+    :return: task info, task latency in seconds
+    """
+    start_time = time.monotonic()
+    delay = 0.5
+    while True:
+        response = catalyst_center_api.task.get_task_by_id(task_id=task_id)
+        task_info = response['response']
+        latency = time.monotonic() - start_time
+        if task_info.get('isError') or task_info.get('endTime'):
+            logging.info(' Task id: ' + task_id + ' completed in ' + str(round(latency, 2)) + ' seconds')
+            return task_info, latency
+        if latency + delay > timeout:
+            raise TimeoutError('Task id: ' + task_id + ' not completed in ' + str(timeout) + ' seconds')
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+
+
+def get_template_hash(template_content):
+    """
+    This function will return the hash of the template content, used to compare templates without their content
+    :param template_content: template content
+    :return: SHA-256 hex digest
+    """
+    return hashlib.sha256((template_content or '').encode('utf-8')).hexdigest()
+
+
+def get_project_templates(catalyst_center_api, project_id):
+    """
+    This function will return a snapshot of all the templates in a project, retrieved in pages of 500 templates
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param project_id: project id
+    :return: {template name: {'id': template id, 'hash': template content hash}}
+    """
+    project_templates = {}
+    offset = 1
+    limit = 500
+    while True:
+        response = catalyst_center_api.configuration_templates.get_templates_details(project_id=project_id,
+                                                                                     offset=offset, limit=limit)
+        templates_list = response['response'] or []
+        for template in templates_list:
+            project_templates[template['name']] = {'id': template['id'],
+                                                   'hash': get_template_hash(template.get('templateContent'))}
+        if len(templates_list) < limit:
+            return project_templates
+        offset += limit
@@ -23,11 +23,15 @@ __license__ = "Cisco Sample Code License, Version 1.1"
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from dnacentersdk import DNACenterAPI
 from dotenv import load_dotenv
 
+import api_metrics
+import catalyst_center_apis
+import git_mirror
 import github_apis
 
 load_dotenv('environment.env')
@@ -37,18 +41,334 @@ CATALYST_CENTER_USER = os.getenv('CATALYST_CENTER_USER')
 CATALYST_CENTER_PASS = os.getenv('CATALYST_CENTER_PASS')
 CATALYST_CENTER_PROJECT = os.getenv('CATALYST_CENTER_PROJECT')
 
+# maximum number of in-flight Catalyst Center template create, update and commit calls
+CATALYST_CENTER_WORKERS = catalyst_center_apis.CATALYST_CENTER_WORKERS
+
 GITHUB_USERNAME = os.getenv('GITHUB_USERNAME')
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_REPO = os.getenv('GITHUB_REPO')
 
+# optional extensions of the repo files synced as templates, example ".txt,.j2", default all the files.
+# The files in hidden folders are not synced
+GITHUB_TEMPLATES_EXTENSIONS = os.getenv('GITHUB_TEMPLATES_EXTENSIONS', '').split(',')
+
 os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
 time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
 
 
+def get_template_name(file):
+    """
+    This function will return the template name for a GitHub file, the file name without the folder and extension
+    :param file: GitHub file name, example "switches/access.j2"
+    :return: template name, example "access"
+    """
+    return os.path.basename(file).split('.')[0]
+
+
+def get_template_files(files_list):
+    """
+    This function will return the GitHub files synced as templates: the files not in a hidden folder, example
+    ".github/", with a template extension if GITHUB_TEMPLATES_EXTENSIONS configured
+    :param files_list: GitHub files names
+    :return: template files, same order
+    """
+    extensions = tuple(extension.strip().lower() for extension in GITHUB_TEMPLATES_EXTENSIONS if extension.strip())
+    return [file for file in files_list if (not extensions or file.lower().endswith(extensions)) and
+            not any(part.startswith('.') for part in file.split('/'))]
+
+
+def log_skipped_files(files_list, template_files):
+    """
+    This function will log the GitHub files not synced as templates
+    :param files_list: GitHub files names
+    :param template_files: template files, as returned by get_template_files
+    :return:
+    """
+    template_files = set(template_files)
+    for file in files_list:
+        if file not in template_files:
+            logging.info(' File "' + file + '" skipped, not a template file')
+
+
+def get_duplicate_files(files_list):
+    """
+    This function will return the files with the same template name, example "a/access.j2" and "b/access.j2"
+    :param files_list: GitHub template files
+    :return: {file: list of the other files with the same template name}
+    """
+    name_files = {}
+    for file in files_list:
+        name_files.setdefault(get_template_name(file), []).append(file)
+    return {file: [other for other in files if other != file]
+            for files in name_files.values() if len(files) > 1 for file in files}
+
+
+def build_template(file, files_commit, mirror_path=None):
+    """
+    This function will build the template from the GitHub file: last commit info followed by the CLI commands
+    :param file: GitHub file name
+    :param files_commit: {file name: last commit details}
+    :param mirror_path: local mirror repo folder, if None the file is retrieved using the GitHub API
+    :return: template content, None if the file could not be retrieved; error message
+    """
+    new_template = '{#\nThis template has been pulled from GitHub.\nUploaded to Catalyst Center by GitHub_Sync App\n'
+
+    # get the last commit message for file, add to template
+    comment = files_commit.get(file)
+    if comment:
+        new_template += 'Author: ' + comment['author'] + '\n'
+        new_template += 'Date: ' + comment['date'] + '\n'
+        new_template += 'Commit message: ' + comment['message'] + '\n'
+        new_template += 'Commit URL: ' + comment['url'] + '\n'
+        new_template += 'Commit Diff: ' + comment['diff'] + '\n'
+    new_template += '#}\n!\n'
+    # append the CLI commands from GitHub file, a download or decode error fails only this template
+    try:
+        if mirror_path:
+            new_template += git_mirror.get_repo_file_content(mirror_path, file)
+        else:
+            new_template += github_apis.get_repo_file_content(username=GITHUB_USERNAME, repo_name=GITHUB_REPO,
+                                                              file_name=file)
+    except Exception as error:
+        logging.error(' File "' + file + '" download failed: ' + str(error))
+        return None, 'download failed: ' + str(error)
+    return new_template, None
+
+
+def sync_template(catalyst_center_api, project_id, project_templates, file, new_template, error_message=None):
+    """
+    This function will create a new template, or update the existing template if different, and wait for the task.
+    The project templates snapshot is updated with the new template id and content hash
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param project_id: project id
+    :param project_templates: {template name: {'id': template id, 'hash': template content hash}}
+    :param file: GitHub file name
+    :param new_template: template content, None if the file could not be retrieved
+    :param error_message: the file download error, if the template content is None
+    :return: {'template_name', 'template_id', 'action': created/updated/unchanged/failed, 'latency', 'message'}
+    """
+    # upload the templates to Catalyst Center - create or update template
+    template_name = get_template_name(file)
+    result = {'template_name': template_name, 'template_id': None, 'action': 'unchanged', 'latency': None,
+              'message': ''}
+    if new_template is None:
+        result['action'] = 'failed'
+        result['message'] = error_message
+        return result
+    logging.info(' Template name: ' + template_name)
+    logging.info(' Template content:\n' + new_template)
+
+    # identify if template exists
+    template_hash = catalyst_center_apis.get_template_hash(new_template)
+    if template_name in project_templates:
+        result['template_id'] = project_templates[template_name]['id']
+
+        # verify if matches the GitHub template
+        if project_templates[template_name]['hash'] == template_hash:
+            logging.info(' Template "' + template_name + '" has not changed, identical template on Catalyst Center')
+            return result
+
+    device_types = [
+        {
+            'productFamily': 'Routers'
+        },
+        {
+            'productFamily': 'Switches and Hubs'
+        }
+    ]
+    try:
+        if result['template_id'] is None:
+            # create new template
+            result['action'] = 'created'
+            response = catalyst_center_api.configuration_templates.create_template(project_id=project_id,
+                                                                                   templateContent=new_template,
+                                                                                   language='JINJA',
+                                                                                   name=template_name,
+                                                                                   deviceTypes=device_types,
+                                                                                   softwareType='IOS-XE',
+                                                                                   author='Jenkins automation',
+                                                                                   description='Created by Python automation')
+            logging.info(' New template "' + template_name + '" created')
+        else:
+            # update the existing template
+            result['action'] = 'updated'
+            response = catalyst_center_api.configuration_templates.update_template(project_id=project_id,
+                                                                                   templateContent=new_template,
+                                                                                   language='JINJA',
+                                                                                   name=template_name,
+                                                                                   deviceTypes=device_types,
+                                                                                   softwareType='IOS-XE',
+                                                                                   author='Jenkins automation',
+                                                                                   description='Updated by Python automation',
+                                                                                   id=result['template_id'])
+            logging.info(' Template "' + template_name + '" has changed, different template on Catalyst Center')
+            logging.info(' Updating existing template "' + template_name + '" id: ' + result['template_id'])
+        task_id = response['response']['taskId']
+        logging.info(' Task id: ' + task_id)
+        task_info, result['latency'] = catalyst_center_apis.wait_for_task(catalyst_center_api, task_id)
+    except Exception as error:
+        task_info = {'isError': True, 'failureReason': str(error)}
+
+    if task_info.get('isError'):
+        logging.error(' Template "' + template_name + '" ' + result['action'] + ' failed: ' +
+                      str(task_info.get('failureReason')))
+        result['message'] = ('create' if result['action'] == 'created' else 'update') + ' failed: ' + str(
+            task_info.get('failureReason'))
+        result['action'] = 'failed'
+        return result
+
+    if result['template_id'] is None:
+        # get the template id, returned in the task data
+        result['template_id'] = task_info.get('data')
+        if not result['template_id']:
+            project_info = catalyst_center_api.configuration_templates.get_projects(name=CATALYST_CENTER_PROJECT)
+            for template in project_info[0]['templates']:
+                if template_name == template['name']:
+                    result['template_id'] = template['id']
+    project_templates[template_name] = {'id': result['template_id'], 'hash': template_hash}
+    return result
+
+
+def commit_template(catalyst_center_api, result):
+    """
+    This function will commit the template, a commit failure will update the template sync result
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param result: template sync result, {'template_name', 'template_id', ...}
+    :return: template sync result
+    """
+    commit_payload = {
+        'comments': 'Jenkins automation committed',
+        'templateId': result['template_id']
+    }
+    try:
+        catalyst_center_api.configuration_templates.version_template(payload=commit_payload)
+        logging.info(' Template "' + result['template_name'] + '" committed\n')
+    except Exception as error:
+        logging.error(' Template "' + result['template_name'] + '" commit failed: ' + str(error))
+        result['message'] = result['action'] + ', commit failed: ' + str(error)
+        result['action'] = 'failed'
+    return result
+
+
+def get_files_commit(files_list, mirror_path=None):
+    """
+    This function will return the last commit details for each file, from the local mirror or the GitHub API
+    :param files_list: GitHub files names
+    :param mirror_path: local mirror repo folder, if None the commits are retrieved using the GitHub API
+    :return: {file name: last commit details}
+    """
+    if mirror_path:
+        # get the last commit for each file from the mirror
+        return git_mirror.get_files_last_commit(mirror_path, GITHUB_USERNAME, GITHUB_REPO, files_list)
+
+    # get the sha list for repo
+    sha_list = github_apis.get_repo_commits(username=GITHUB_USERNAME, repo_name=GITHUB_REPO)
+
+    # get the last commit for each file, only the commits not in the local cache are retrieved
+    return github_apis.get_files_last_commit(username=GITHUB_USERNAME, repo_name=GITHUB_REPO, files_list=files_list,
+                                             sha_list=sha_list)
+
+
+def get_project_id(catalyst_center_api, task_latencies):
+    """
+    This function will return the Catalyst Center project id, the project will be created if not found
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param task_latencies: list of the observed Catalyst Center task latencies, the project create task is added
+    :return: project id, None if the project could not be created; report
+    """
+    report = ''
+    project_info = catalyst_center_api.configuration_templates.get_projects(name=CATALYST_CENTER_PROJECT)
+    if not project_info:
+        # unable to find the project, create new project
+        logging.info(' Project "' + CATALYST_CENTER_PROJECT + '" not found, will create project')
+        report += 'Project "' + CATALYST_CENTER_PROJECT + '" not found, created\n'
+        # create new project
+        response = catalyst_center_api.configuration_templates.create_project(name=CATALYST_CENTER_PROJECT)
+        task_info, latency = catalyst_center_apis.wait_for_task(catalyst_center_api, response['response']['taskId'])
+        task_latencies.append(latency)
+        if task_info.get('isError'):
+            logging.error(' Project "' + CATALYST_CENTER_PROJECT + '" not created: ' +
+                          str(task_info.get('failureReason')))
+            return None, report
+
+        # retrieve the project id for the new project
+        project_info = catalyst_center_api.configuration_templates.get_projects(name=CATALYST_CENTER_PROJECT)
+    project_id = project_info[0]['id']
+    logging.info(' Project "' + CATALYST_CENTER_PROJECT + '" id: ' + project_id)
+    return project_id, report
+
+
+def sync_templates(catalyst_center_api, project_id, project_templates, files_list, files_commit, task_latencies,
+                   mirror_path=None, repo_files=None):
+    """
+    This function will sync the GitHub files with the project templates: build the templates, create or update the
+    changed templates, commit them, and save the templates in the local folder.
+    The files with the same template name as another repo file are not synced, they are reported as failed
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param project_id: project id
+    :param project_templates: {template name: {'id': template id, 'hash': template content hash}}
+    :param files_list: GitHub template files
+    :param files_commit: {file name: last commit details}
+    :param task_latencies: list of the observed Catalyst Center task latencies, the template tasks are added
+    :param mirror_path: local mirror repo folder, if None the files are retrieved using the GitHub API
+    :param repo_files: all the repo template files, to find the duplicate template names, default the files list
+    :return: report, each template outcome in the files list order; list of the files not synced
+    """
+    report = ''
+    duplicate_files = get_duplicate_files(files_list if repo_files is None else repo_files)
+
+    def get_template(file):
+        if file in duplicate_files:
+            logging.error(' File "' + file + '" not synced, duplicate template name')
+            return None, 'not synced, duplicate template name, same name as: ' + ', '.join(duplicate_files[file])
+        return build_template(file, files_commit, mirror_path)
+
+    # stage 1: download the files content from GitHub, concurrently, and build the templates
+    with ThreadPoolExecutor(max_workers=github_apis.GITHUB_WORKERS) as executor:
+        built_list = list(executor.map(get_template, files_list))
+    templates_list = [new_template for new_template, error_message in built_list]
+
+    # stage 2: create or update the changed templates, with a limited number of in-flight Catalyst Center tasks,
+    # the files not retrieved are reported as failed
+    with ThreadPoolExecutor(max_workers=CATALYST_CENTER_WORKERS) as executor:
+        results = list(executor.map(
+            lambda item: sync_template(catalyst_center_api, project_id, project_templates, item[0], *item[1]),
+            zip(files_list, built_list)))
+
+    # stage 3: commit the created and updated templates
+    committed_list = [result for result in results if result['action'] in ('created', 'updated')]
+    with ThreadPoolExecutor(max_workers=CATALYST_CENTER_WORKERS) as executor:
+        list(executor.map(lambda item: commit_template(catalyst_center_api, item), committed_list))
+
+    # report each template outcome in the repository order, save the templates in local folder
+    failed_files = []
+    for file, new_template, result in zip(files_list, templates_list, results):
+        template_name = result['template_name']
+        if result['latency'] is not None:
+            task_latencies.append(result['latency'])
+        if result['action'] == 'created':
+            report += 'New template "' + template_name + '" created and committed\n'
+        elif result['action'] == 'updated':
+            report += 'Template "' + template_name + '" has changed, updated and committed on Catalyst Center\n'
+        elif result['action'] == 'unchanged':
+            report += 'Template "' + template_name + '" has not changed, identical template on Catalyst Center\n'
+        else:
+            report += 'Template "' + template_name + '" ' + result['message'] + '\n'
+            failed_files.append(file)
+            continue
+
+        os.makedirs(os.path.dirname('templates/' + file), exist_ok=True)
+        with open(('templates/' + file), 'w', encoding='utf-8') as f:
+            f.write(new_template)
+
+    return report, failed_files
+
+
 def main():
     """
     This app will sync CLI templates from GitHub repos with Catalyst Center projects/templates:
      - identify if the specific repository exists in GitHub, pull or clone the repos
+       - mirror mode, if GITHUB_MIRROR_PATH configured: clone or fetch a local mirror, read files and commits from it
      - will verify if the Catalyst Center project exists and creates a new one
      - verify if Catalyst Center templates exist and are identical with the last version of the GitHub repo files
      - will create new templates or update existing ones, with these details:
@@ -71,173 +391,78 @@ def main():
 
     # create a report with each template operation - create, update or no change
     report = ''
+    # observed Catalyst Center task latencies, seconds
+    task_latencies = []
 
-    # create a DNACenterAPI "Connection Object" to use the Python SDK
+    # create a DNACenterAPI "Connection Object" to use the Python SDK, with adaptive concurrency and retries
     catalyst_center_api = DNACenterAPI(username=CATALYST_CENTER_USER, password=CATALYST_CENTER_PASS,
                                        base_url=CATALYST_CENTER_URL, version='2.3.5.3',
-                                       verify=False)
-
-    # get the repos for user
-    repos = github_apis.get_repos(GITHUB_USERNAME)
-
-    # verify if repo exists
-    if GITHUB_REPO not in repos:
-        logging.info(' Repo "' + GITHUB_REPO + '" not found!')
-        return
-    logging.info(' Repo "' + GITHUB_REPO + '" found!')
-
-    # get the repo details
-    files_list = github_apis.get_repo_content(GITHUB_USERNAME, GITHUB_REPO)
+                                       verify=False, wait_on_rate_limit=False,
+                                       session=catalyst_center_apis.create_session())
+    catalyst_center_api = catalyst_center_apis.AdaptiveApi(catalyst_center_api)
+
+    # mirror mode, read the templates and the commits from a local clone of the repo, updated with git fetch
+    mirror_path = None
+    if git_mirror.GITHUB_MIRROR_PATH:
+        mirror_path = git_mirror.sync_mirror(GITHUB_USERNAME, GITHUB_REPO)
+
+    if mirror_path:
+        logging.info(' Repo "' + GITHUB_REPO + '" mirror synced: ' + mirror_path)
+        repo_files = git_mirror.get_repo_content(mirror_path)
+    else:
+        # get the repos for user
+        repos = github_apis.get_repos(GITHUB_USERNAME)
+
+        # verify if repo exists
+        if GITHUB_REPO not in repos:
+            logging.info(' Repo "' + GITHUB_REPO + '" not found!')
+            return
+        logging.info(' Repo "' + GITHUB_REPO + '" found!')
+
+        # get the repo details
+        repo_files = github_apis.get_repo_content(GITHUB_USERNAME, GITHUB_REPO)
+    # only the template files are synced
+    files_list = get_template_files(repo_files)
+    log_skipped_files(repo_files, files_list)
     if not files_list:
-        logging.info(' Repo "' + GITHUB_REPO + '" is empty')
+        logging.info(' Repo "' + GITHUB_REPO + '" has no template files')
         return
     logging.info(' Repo "' + GITHUB_REPO + '" files:')
     for file in files_list:
         logging.info(' File: ' + file)
 
-    # get the sha list for repo
-    sha_list = github_apis.get_repo_commits(username=GITHUB_USERNAME, repo_name=GITHUB_REPO)
-    comments_list = []
-
-    # get the comments for each sha from the list
-    for sha in sha_list:
-        comment = github_apis.get_repo_commit_sha(username=GITHUB_USERNAME, repo_name=GITHUB_REPO, sha=sha)
-        comments_list.append(comment)
+    files_commit = get_files_commit(files_list, mirror_path)
     logging.info(' Collected all commit comments for "' + GITHUB_REPO + '" repo')
 
     # check if existing Catalyst Center project, if not create a new project
-    projects_list = catalyst_center_api.configuration_templates.get_projects(name=CATALYST_CENTER_PROJECT)
-    if not projects_list:
-        # unable to find the project, create new project
-        logging.info(' Project "' + CATALYST_CENTER_PROJECT + '" not found, will create project')
-        report += 'Project "' + CATALYST_CENTER_PROJECT + '" not found, created\n'
-        # create new project
-        response = catalyst_center_api.configuration_templates.create_project(name=CATALYST_CENTER_PROJECT)
-        time.sleep(10)
+    project_id, project_report = get_project_id(catalyst_center_api, task_latencies)
+    report += project_report
+    if project_id is None:
+        return
 
-    # retrieve the project id for the project
-    project_info = catalyst_center_api.configuration_templates.get_projects(name=CATALYST_CENTER_PROJECT)
-    project_id = project_info[0]['id']
-    logging.info(' Project "' + CATALYST_CENTER_PROJECT + '" id: ' + project_id)
+    # project snapshot, all the templates ids and content hashes, updated after each template create or update
+    project_templates = catalyst_center_apis.get_project_templates(catalyst_center_api, project_id)
+    logging.info(' Project "' + CATALYST_CENTER_PROJECT + '" templates: ' + str(len(project_templates)))
 
-    # get the files content, loop to pull each file, upload to Catalyst Center, commit
+    report += sync_templates(catalyst_center_api, project_id, project_templates, files_list, files_commit,
+                             task_latencies, mirror_path)[0]
 
-    for file in files_list:
-        new_template = '{#\nThis template has been pulled from GitHub.\nUploaded to Catalyst Center by GitHub_Sync App\n'
-
-        # get the last commit message for file, add to template
-        for comment in comments_list:
-            if file == comment['filename']:
-                new_template += 'Author: ' + comment['author'] + '\n'
-                new_template += 'Date: ' + comment['date'] + '\n'
-                new_template += 'Commit message: ' + comment['message'] + '\n'
-                new_template += 'Commit URL: ' + comment['url'] + '\n'
-                new_template += 'Commit Diff: ' + comment['diff'] + '\n'
-                break
-        new_template += '#}\n!\n'
-        # append the CLI commands from GitHub file
-        new_template += github_apis.get_repo_file_content(username=GITHUB_USERNAME, repo_name=GITHUB_REPO,
-                                                          file_name=file)
-
-        # upload the templates to Catalyst Center - create or update template
-        template_name = file.split('.')[0]
-        logging.info(' Template name: ' + template_name)
-        logging.info(' Template content:\n' + new_template)
-
-        # identify if template exists
-        template_id = None
-        templates_list = project_info[0]['templates']
-        for template in templates_list:
-            if template_name == template['name']:
-                template_id = template['id']
-
-        device_types = [
-            {
-                'productFamily': 'Routers'
-            },
-            {
-                'productFamily': 'Switches and Hubs'
-            }
-        ]
-        if template_id is None:
+    if task_latencies:
+        report += ('Catalyst Center tasks: ' + str(len(task_latencies)) + ', average time: ' +
+                   str(round(sum(task_latencies) / len(task_latencies), 2)) + ' seconds, maximum time: ' +
+                   str(round(max(task_latencies), 2)) + ' seconds\n')
 
-            # create new template
-            response = catalyst_center_api.configuration_templates.create_template(project_id=project_id,
-                                                                                   templateContent=new_template,
-                                                                                   language='JINJA',
-                                                                                   name=template_name,
-                                                                                   deviceTypes=device_types,
-                                                                                   softwareType='IOS-XE',
-                                                                                   author='Jenkins automation',
-                                                                                   description='Created by Python automation')
-            logging.info(' New template "' + template_name + '" created')
-            task_id = response['response']['taskId']
-            logging.info(' Task id: ' + task_id)
-            time.sleep(10)
-
-            # get the template id
-            project_info = catalyst_center_api.configuration_templates.get_projects(name=CATALYST_CENTER_PROJECT)
-            templates_list = project_info[0]['templates']
-            for template in templates_list:
-                if template_name == template['name']:
-                    template_id = template['id']
-
-            # commit the template
-            commit_payload = {
-                'comments': 'Jenkins automation committed',
-                'templateId': template_id
-            }
-            response = catalyst_center_api.configuration_templates.version_template(payload=commit_payload)
-            logging.info(' Template "' + template_name + '" committed\n')
-            report += 'New template "' + template_name + '" created and committed\n'
-
-        else:
-            # update the existing template if different
-
-            # retrieve the existing template
-            response = catalyst_center_api.configuration_templates.get_templates_details(name=template_name,
-                                                                                         project_id=project_id)
-
-            if response['response']:
-
-                catalyst_center_existing_template = response['response'][0]['templateContent']
-                # verify if matches the GitHub template
-                if catalyst_center_existing_template == new_template:
-                    logging.info(
-                        ' Template "' + template_name + '" has not changed, identical template on Catalyst Center')
-                    report += (
-                            'Template "' + template_name + '" has not changed, identical template on Catalyst Center\n')
-                else:
-                    response = catalyst_center_api.configuration_templates.update_template(project_id=project_id,
-                                                                                           templateContent=new_template,
-                                                                                           language='JINJA',
-                                                                                           name=template_name,
-                                                                                           deviceTypes=device_types,
-                                                                                           softwareType='IOS-XE',
-                                                                                           author='Jenkins automation',
-                                                                                           description='Updated by Python automation',
-                                                                                           id=template_id)
-                    logging.info(' Template "' + template_name + '" has changed, different template on Catalyst Center')
-                    logging.info(' Updating existing template "' + template_name + '" id: ' + template_id)
-
-                    time.sleep(10)
-
-                    # commit the template
-                    commit_payload = {
-                        'comments': 'Jenkins automation committed',
-                        'templateId': template_id
-                    }
-                    response = catalyst_center_api.configuration_templates.version_template(payload=commit_payload)
-                    logging.info(' Template "' + template_name + '" committed\n')
-                    report += (
-                            'Template "' + template_name + '" has changed, updated and committed on Catalyst Center\n')
-
-        # save template in local folder
-        with open(('templates/' + file), 'w', encoding='utf-8') as f:
-            f.write(new_template)
+    # API calls metrics for each endpoint
+    for line in api_metrics.get_report_lines():
+        report += line.strip() + '\n'
+    api_metrics.save_metrics()
 
     logging.info('\nGitHub Sync Report:\n' + report)
 
+    cache_stats = github_apis.get_cache_stats()
+    logging.info(' GitHub conditional requests, cache hits: ' + str(cache_stats['hits']) + ', cache misses: ' +
+                 str(cache_stats['misses']))
+
     date_time = str(datetime.now().replace(microsecond=0))
     logging.info(' End of Application "catalyst_center_github_sync.py" Run: ' + date_time)
 
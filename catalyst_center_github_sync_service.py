@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from dnacentersdk import DNACenterAPI
+from dotenv import load_dotenv
+
+import api_metrics
+import catalyst_center_apis
+import catalyst_center_github_sync
+import git_mirror
+import github_apis
+
+load_dotenv('environment.env')
+
+CATALYST_CENTER_URL = os.getenv('CATALYST_CENTER_URL')
+CATALYST_CENTER_USER = os.getenv('CATALYST_CENTER_USER')
+CATALYST_CENTER_PASS = os.getenv('CATALYST_CENTER_PASS')
+
+GITHUB_USERNAME = os.getenv('GITHUB_USERNAME')
+GITHUB_REPO = os.getenv('GITHUB_REPO')
+
+# secret configured for the GitHub repo webhook, used to verify the payload signature
+GITHUB_WEBHOOK_SECRET = os.getenv('GITHUB_WEBHOOK_SECRET')
+# local HTTP endpoint for the GitHub push webhooks
+GITHUB_WEBHOOK_HOST = os.getenv('GITHUB_WEBHOOK_HOST', '0.0.0.0')
+GITHUB_WEBHOOK_PORT = int(os.getenv('GITHUB_WEBHOOK_PORT', 8080))
+# branch synced with Catalyst Center, the pushes to other branches are ignored
+GITHUB_WEBHOOK_BRANCH = os.getenv('GITHUB_WEBHOOK_BRANCH', 'main')
+# seconds without new pushes before the changed templates are synced
+GITHUB_WEBHOOK_DEBOUNCE = float(os.getenv('GITHUB_WEBHOOK_DEBOUNCE', 5))
+# maximum seconds a push waits for the sync, during a continuous burst of pushes
+GITHUB_WEBHOOK_MAX_DELAY = float(os.getenv('GITHUB_WEBHOOK_MAX_DELAY', 30))
+# seconds to wait before retrying a failed sync
+GITHUB_WEBHOOK_RETRY = float(os.getenv('GITHUB_WEBHOOK_RETRY', 60))
+# maximum number of retries for a failed file or sync, the failed files are then parked until changed by a new push
+GITHUB_WEBHOOK_MAX_RETRIES = int(os.getenv('GITHUB_WEBHOOK_MAX_RETRIES', 3))
+
+# GitHub webhook payloads are capped at 25 MB, and include at most 20 commits
+MAX_PAYLOAD_SIZE = 25 * 1024 * 1024
+MAX_PAYLOAD_COMMITS = 20
+
+os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
+time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
+
+
+def get_signature(body, secret):
+    """
+    This function will return the GitHub webhook signature for the payload
+    :param body: payload, bytes
+    :param secret: webhook secret
+    :return: signature, "sha256=" followed by the HMAC hex digest
+    """
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature, secret):
+    """
+    This function will verify the GitHub webhook signature, the "X-Hub-Signature-256" header
+    :param body: payload, bytes
+    :param signature: signature header value
+    :param secret: webhook secret
+    :return: True if the signature is valid
+    """
+    if not signature or not secret:
+        return False
+    return hmac.compare_digest(get_signature(body, secret), signature)
+
+
+def get_changed_files(payload):
+    """
+    This function will return the files changed by a push, from the push webhook payload commits, in order
+    :param payload: push webhook payload
+    :return: added or modified files, removed files, True if the payload does not list all the changes
+    """
+    changed_files = set()
+    removed_files = set()
+    commits = payload.get('commits') or []
+    for commit in commits:
+        for file in (commit.get('added') or []) + (commit.get('modified') or []):
+            removed_files.discard(file)
+            changed_files.add(file)
+        for file in commit.get('removed') or []:
+            changed_files.discard(file)
+            removed_files.add(file)
+    # the payload lists at most 20 commits, and a forced push may remove commits not listed
+    full_sync = len(commits) >= MAX_PAYLOAD_COMMITS or bool(payload.get('forced'))
+    return changed_files, removed_files, full_sync
+
+
+class ChangeQueue:
+    """
+    This class will collect the files changed by the pushes, a burst of pushes is merged in a single sync batch.
+    The batch is ready when there are no new pushes for the debounce time, or when the oldest push waited
+    for the maximum delay
+    """
+
+    def __init__(self, debounce=GITHUB_WEBHOOK_DEBOUNCE, max_delay=GITHUB_WEBHOOK_MAX_DELAY):
+        """
+        :param debounce: seconds without new pushes before the batch is ready
+        :param max_delay: maximum seconds from the first push in the batch
+        """
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.changed_files = set()
+        self.removed_files = set()
+        self.full_sync = False
+        self.first_time = None
+        self.last_time = None
+
+    def add(self, changed_files, removed_files, full_sync=False):
+        """
+        This method will add the changes from a push, the latest change for each file wins
+        :param changed_files: added or modified files
+        :param removed_files: removed files
+        :param full_sync: True to sync all the repo files
+        :return:
+        """
+        with self.condition:
+            for file in changed_files:
+                self.removed_files.discard(file)
+                self.changed_files.add(file)
+            for file in removed_files:
+                self.changed_files.discard(file)
+                self.removed_files.add(file)
+            self.full_sync = self.full_sync or full_sync
+            self.last_time = time.monotonic()
+            if self.first_time is None:
+                self.first_time = self.last_time
+            self.condition.notify_all()
+
+    def get_pending_count(self):
+        """
+        This method will return the number of files waiting for the sync
+        :return: number of files
+        """
+        with self.condition:
+            return len(self.changed_files) + len(self.removed_files)
+
+    def get_batch(self):
+        """
+        This method will wait for the next batch of changes
+        :return: changed files, removed files, full sync flag
+        """
+        with self.condition:
+            while True:
+                if self.first_time is None:
+                    self.condition.wait()
+                    continue
+                wait_time = min(self.last_time + self.debounce, self.first_time + self.max_delay) - time.monotonic()
+                if wait_time <= 0:
+                    break
+                self.condition.wait(wait_time)
+            batch = (sorted(self.changed_files), sorted(self.removed_files), self.full_sync)
+            self.changed_files = set()
+            self.removed_files = set()
+            self.full_sync = False
+            self.first_time = None
+            self.last_time = None
+            return batch
+
+
+class TemplateSyncService:
+    """
+    This class will sync the templates changed in GitHub with Catalyst Center, using the same Catalyst Center
+    session and project for all the syncs. The Python SDK will refresh the session token when expired
+    """
+
+    def __init__(self):
+        # create a DNACenterAPI "Connection Object" to use the Python SDK, with adaptive concurrency and retries
+        catalyst_center_api = DNACenterAPI(username=CATALYST_CENTER_USER, password=CATALYST_CENTER_PASS,
+                                           base_url=CATALYST_CENTER_URL, version='2.3.5.3',
+                                           verify=False, wait_on_rate_limit=False,
+                                           session=catalyst_center_apis.create_session())
+        self.catalyst_center_api = catalyst_center_apis.AdaptiveApi(catalyst_center_api)
+        self.project_id = None
+        self.status = {'syncs': 0, 'failed_syncs': 0, 'last_sync': None, 'last_sync_time': None, 'parked_files': []}
+        # number of failed syncs for each file, and for the whole sync
+        self.file_failures = {}
+        self.sync_failures = 0
+        # a full sync is needed after a sync failed more than the maximum retries
+        self.full_sync_pending = False
+
+    def sync(self, files_list=None, removed_files=()):
+        """
+        This method will sync the files with the project templates
+        :param files_list: added or modified files, None to sync all the repo files
+        :param removed_files: removed files, the templates are not deleted from Catalyst Center
+        :return: report, list of the files not synced and to retry, the files with a duplicate template name are not
+        retried
+        """
+        start_time = time.monotonic()
+        report = ''
+        task_latencies = []
+        failed_files = []
+
+        # mirror mode, fetch the pushed commits to the local clone of the repo
+        mirror_path = None
+        if git_mirror.GITHUB_MIRROR_PATH:
+            mirror_path = git_mirror.sync_mirror(GITHUB_USERNAME, GITHUB_REPO)
+        # the repo files are listed for each sync, to find the duplicate template names
+        if mirror_path:
+            all_files = git_mirror.get_repo_content(mirror_path)
+        else:
+            all_files = github_apis.get_repo_content(GITHUB_USERNAME, GITHUB_REPO)
+        repo_files = catalyst_center_github_sync.get_template_files(all_files)
+        # the skipped files are logged for the synced files, all the repo files for a full sync
+        if files_list is None:
+            files_list = all_files
+        template_files = catalyst_center_github_sync.get_template_files(files_list)
+        catalyst_center_github_sync.log_skipped_files(files_list, template_files)
+        files_list = template_files
+        removed_files = catalyst_center_github_sync.get_template_files(removed_files)
+        # the files with the same template name as a removed file may no longer be duplicates, they are synced again
+        removed_names = {catalyst_center_github_sync.get_template_name(file) for file in removed_files}
+        files_list = files_list + [file for file in repo_files if file not in files_list and
+                                   catalyst_center_github_sync.get_template_name(file) in removed_names]
+        duplicate_files = catalyst_center_github_sync.get_duplicate_files(repo_files)
+
+        for file in removed_files:
+            report += 'File "' + file + '" removed from GitHub, template not deleted on Catalyst Center\n'
+
+        if files_list:
+            if self.project_id is None:
+                self.project_id, project_report = catalyst_center_github_sync.get_project_id(
+                    self.catalyst_center_api, task_latencies)
+                report += project_report
+                if self.project_id is None:
+                    raise RuntimeError('Project "' + catalyst_center_github_sync.CATALYST_CENTER_PROJECT +
+                                       '" not created')
+
+            # the project snapshot is read for each sync, the templates may be updated on Catalyst Center
+            project_templates = catalyst_center_apis.get_project_templates(self.catalyst_center_api,
+                                                                           self.project_id)
+            files_commit = catalyst_center_github_sync.get_files_commit(files_list, mirror_path)
+            templates_report, failed_files = catalyst_center_github_sync.sync_templates(
+                self.catalyst_center_api, self.project_id, project_templates, files_list, files_commit,
+                task_latencies, mirror_path, repo_files)
+            report += templates_report
+
+        sync_time = round(time.monotonic() - start_time, 2)
+        report += ('Synced ' + str(len(files_list)) + ' files, ' + str(len(removed_files)) + ' removed files, in ' +
+                   str(sync_time) + ' seconds\n')
+        self.status['syncs'] += 1
+        self.status['last_sync'] = str(datetime.now().replace(microsecond=0))
+        self.status['last_sync_time'] = sync_time
+        # a duplicate template name fails each sync, the files are synced again when changed or removed by a new push
+        return report, [file for file in failed_files if file not in duplicate_files]
+
+    def get_retry_files(self, synced_files, failed_files):
+        """
+        This method will update the failures count for each file, and return the failed files to retry. The files
+        failed more than the maximum retries are parked, they are synced again when changed by a new push
+        :param synced_files: files in the sync batch
+        :param failed_files: files not synced
+        :return: files to retry
+        """
+        failed_files = set(failed_files)
+        retry_files = []
+        for file in synced_files:
+            if file not in failed_files:
+                self.file_failures.pop(file, None)
+                continue
+            self.file_failures[file] = self.file_failures.get(file, 0) + 1
+            if self.file_failures[file] > GITHUB_WEBHOOK_MAX_RETRIES:
+                logging.error(' File "' + file + '" failed ' + str(self.file_failures[file]) +
+                              ' syncs, parked until changed by a new push')
+            else:
+                retry_files.append(file)
+        self.status['parked_files'] = sorted(file for file, failures in self.file_failures.items()
+                                             if failures > GITHUB_WEBHOOK_MAX_RETRIES)
+        return retry_files
+
+    def schedule_retry(self, change_queue, changed_files, removed_files=(), full_sync=False):
+        """
+        This method will queue the changes again after the retry time, the new pushes are synced meanwhile
+        :param change_queue: ChangeQueue object
+        :param changed_files: added or modified files
+        :param removed_files: removed files
+        :param full_sync: True to sync all the repo files
+        :return:
+        """
+        timer = threading.Timer(GITHUB_WEBHOOK_RETRY, change_queue.add, (changed_files, removed_files, full_sync))
+        timer.daemon = True
+        timer.start()
+
+    def run(self, change_queue):
+        """
+        This method will sync each batch of changes. The failed files are queued again after the retry time, up to the
+        maximum retries. A failed sync is retried up to the maximum retries, then a full sync is run with the next push
+        :param change_queue: ChangeQueue object
+        :return:
+        """
+        while True:
+            changed_files, removed_files, full_sync = change_queue.get_batch()
+            full_sync = full_sync or self.full_sync_pending
+            # a new push for a parked file is a new sync, the file is retried again
+            for file in changed_files:
+                if self.file_failures.get(file, 0) > GITHUB_WEBHOOK_MAX_RETRIES:
+                    self.file_failures.pop(file)
+            try:
+                report, failed_files = self.sync(None if full_sync else changed_files, removed_files)
+                logging.info('\nGitHub Sync Report:\n' + report)
+                self.sync_failures = 0
+                self.full_sync_pending = False
+                synced_files = set(self.file_failures) | set(failed_files) if full_sync else changed_files
+                retry_files = self.get_retry_files(synced_files, failed_files)
+                if retry_files:
+                    logging.error(' Files not synced: ' + str(len(retry_files)) + ', retry in ' +
+                                  str(GITHUB_WEBHOOK_RETRY) + ' seconds')
+                    self.schedule_retry(change_queue, retry_files)
+            except Exception as error:
+                self.status['failed_syncs'] += 1
+                self.sync_failures += 1
+                if self.sync_failures > GITHUB_WEBHOOK_MAX_RETRIES:
+                    # the changes are not lost, a full sync will run with the next push
+                    logging.error(' Sync failed ' + str(self.sync_failures) + ' times, full sync with the next push: ' +
+                                  str(error))
+                    self.sync_failures = 0
+                    self.full_sync_pending = True
+                else:
+                    logging.error(' Sync failed, retry in ' + str(GITHUB_WEBHOOK_RETRY) + ' seconds: ' + str(error))
+                    self.schedule_retry(change_queue, changed_files, removed_files, full_sync)
+            api_metrics.save_metrics()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    This class will handle the GitHub webhook requests, the push events are added to the change queue.
+    A GET request will return the service status
+    """
+
+    change_queue = None
+    service = None
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        status = dict(self.service.status, pending_files=self.change_queue.get_pending_count())
+        self.send_json(200, status)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_PAYLOAD_SIZE:
+            self.send_json(413, {'message': 'payload too large'})
+            return
+        body = self.rfile.read(length)
+        if not verify_signature(body, self.headers.get('X-Hub-Signature-256'), GITHUB_WEBHOOK_SECRET):
+            logging.warning(' Webhook signature not valid, from ' + self.client_address[0])
+            self.send_json(401, {'message': 'signature not valid'})
+            return
+
+        event = self.headers.get('X-GitHub-Event')
+        if event == 'ping':
+            self.send_json(200, {'message': 'pong'})
+            return
+        if event != 'push':
+            self.send_json(202, {'message': 'event ignored'})
+            return
+
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                payload = json.loads(parse_qs(body.decode())['payload'][0])
+            else:
+                payload = json.loads(body)
+        except (ValueError, KeyError):
+            self.send_json(400, {'message': 'payload not valid'})
+            return
+
+        repo_name = (payload.get('repository') or {}).get('name')
+        if (repo_name != GITHUB_REPO or payload.get('ref') != 'refs/heads/' + GITHUB_WEBHOOK_BRANCH or
+                payload.get('deleted')):
+            self.send_json(202, {'message': 'push ignored'})
+            return
+
+        changed_files, removed_files, full_sync = get_changed_files(payload)
+        self.change_queue.add(changed_files, removed_files, full_sync)
+        logging.info(' Push ' + str(payload.get('after')) + ' queued, changed files: ' + str(len(changed_files)) +
+                     ', removed files: ' + str(len(removed_files)) + ', full sync: ' + str(full_sync))
+        self.send_json(202, {'message': 'queued', 'changed_files': sorted(changed_files),
+                             'removed_files': sorted(removed_files), 'full_sync': full_sync})
+
+    def log_message(self, format, *args):
+        logging.debug(' ' + self.address_string() + ' ' + (format % args))
+
+
+def send_payload(url, payload_file, event='push'):
+    """
+    This function will send a recorded webhook payload to the service, signed with the webhook secret
+    :param url: service URL
+    :param payload_file: payload file, JSON
+    :param event: GitHub event name
+    :return: service response
+    """
+    with open(payload_file, 'rb') as f:
+        body = f.read()
+    request = urllib.request.Request(url, data=body, method='POST',
+                                     headers={'Content-Type': 'application/json', 'X-GitHub-Event': event,
+                                              'X-Hub-Signature-256': get_signature(body, GITHUB_WEBHOOK_SECRET)})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    """
+    This app will run the GitHub templates sync as a service, triggered by the GitHub push webhooks:
+     - a full sync at start, for the pushes while the service was not running
+     - verify the webhook signature, using the webhook secret
+     - collect the added, modified and removed files from the push commits
+     - merge a burst of pushes in a single sync, after the debounce time
+     - sync only the changed templates, using the same Catalyst Center session for all the syncs
+    A recorded payload may be sent to the service with the "--send" option, example a GitHub webhook delivery.
+
+    This app is using the Python SDK to make REST API calls to Catalyst Center.
+
+    """
+    parser = argparse.ArgumentParser(description='Catalyst Center GitHub templates sync service')
+    parser.add_argument('--send', help='send a recorded webhook payload file to the service, and exit')
+    parser.add_argument('--event', default='push', help='GitHub event for the recorded payload, default push')
+    parser.add_argument('--url', default='http://127.0.0.1:' + str(GITHUB_WEBHOOK_PORT) + '/',
+                        help='service URL for the recorded payload')
+    args = parser.parse_args()
+
+    # logging, debug level, to file {application_run.log}
+    logging.basicConfig(level=logging.INFO)
+
+    if not GITHUB_WEBHOOK_SECRET:
+        logging.error(' GITHUB_WEBHOOK_SECRET not configured')
+        return
+
+    if args.send:
+        try:
+            print(json.dumps(send_payload(args.url, args.send, args.event), indent=4))
+        except urllib.error.HTTPError as error:
+            logging.error(' Payload not accepted: ' + str(error.code) + ' ' + error.read().decode())
+        return
+
+    current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logging.info(' App "catalyst_center_github_sync_service.py" Start, ' + current_time)
+
+    change_queue = ChangeQueue()
+    service = TemplateSyncService()
+    WebhookHandler.change_queue = change_queue
+    WebhookHandler.service = service
+
+    # full sync at start
+    change_queue.add(set(), set(), full_sync=True)
+    threading.Thread(target=service.run, args=(change_queue,), daemon=True).start()
+
+    server = ThreadingHTTPServer((GITHUB_WEBHOOK_HOST, GITHUB_WEBHOOK_PORT), WebhookHandler)
+    logging.info(' Listening for GitHub webhooks on ' + GITHUB_WEBHOOK_HOST + ':' + str(GITHUB_WEBHOOK_PORT))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    api_metrics.save_metrics()
+
+    date_time = str(datetime.now().replace(microsecond=0))
+    logging.info(' End of Application "catalyst_center_github_sync_service.py" Run: ' + date_time)
+
+
+if __name__ == '__main__':
+    main()
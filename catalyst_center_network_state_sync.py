@@ -22,15 +22,26 @@ __license__ = "Cisco Sample Code License, Version 1.1"
 
 import json
 import logging
+import multiprocessing
 import os
+import re
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 
 from dnacentersdk import DNACenterAPI
 from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 
+import api_metrics
+import catalyst_center_apis
+import device_cache
 import github_apis
+import network_state_diff
+import network_state_files
+import network_state_history
 
 load_dotenv('environment.env')
 
@@ -44,136 +55,200 @@ GITHUB_REPO = os.getenv('GITHUB_NETWORK_STATE_REPO')
 
 NETWORK_STATE_PATH = 'network_state/'
 
+# multi-controller mode, JSON file with the list of controllers, each collected to a folder in NETWORK_STATE_PATH
+CATALYST_CENTER_CONTROLLERS = os.getenv('CATALYST_CENTER_CONTROLLERS')
+
+# number of concurrent Catalyst Center API calls used to collect the device details
+CATALYST_CENTER_WORKERS = catalyst_center_apis.CATALYST_CENTER_WORKERS
+
+# device role API status codes for the devices not in a fabric, with a fabric error description
+NOT_IN_FABRIC_STATUS_CODES = (400, 404)
+
+# maximum number of devices collected and not yet saved, a device waiting for an API call retry does not stall the
+# collection of the following devices
+DEVICE_WINDOW = 1000
+
+# save the full network settings for each site, instead of the settings different from the parent site
+NETWORK_SETTINGS_EXPANDED = os.getenv('NETWORK_SETTINGS_EXPANDED', 'False').lower() == 'true'
+
 os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
 time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
 
 
-# noinspection PyBroadException
-def main():
+def get_device_list(catalyst_center_api, device_count):
     """
-    This app will sync Catalyst Center state documented as code to a GitHub repo:
-     - collect the Catalyst Center device inventory
-     - retrieve the Catalyst Center Site hierarchy for all sites
-     - collect the network settings for all sites
-     - identify if the specific repository exists in GitHub
-     - it will commit the new or updated network state files
-     - at the end of execution a report will be created
-    This app may be part of a CI/CD pipeline to run on-demand or scheduled.
-
-    This app is using the Python SDK to make REST API calls to Cisco Catalyst Center.
-
+    This function will return the device list, pages of 500 devices retrieved concurrently
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param device_count: number of devices
+    :return: generator of devices info
     """
+    return catalyst_center_apis.get_paged_items(catalyst_center_api.devices.get_device_list, device_count,
+                                                CATALYST_CENTER_WORKERS)
 
-    # logging, debug level, to file {application_run.log}
-    logging.basicConfig(level=logging.INFO)
-
-    current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-    logging.info(' Application "catalyst_center_network_state_sync.py" Start, ' + current_time)
 
-    # verify if folder for state files exist
+def get_network_settings(catalyst_center_api, site_list):
+    """
+    This function will return the network settings for each site, retrieved concurrently, in the site list order.
+    Unless NETWORK_SETTINGS_EXPANDED, each site will include only the settings different from the parent site
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param site_list: list of sites, {'site_name_hierarchy', 'site_id'}, sorted by site name hierarchy
+    :return: generator of sites settings
+    """
+    def get_site_settings(site):
+        response = catalyst_center_api.network_settings.get_network_v2(site_id=site['site_id'])
+        site_settings = {'site_name_hierarchy': site['site_name_hierarchy']}
+        site_settings.update({'network_settings': response['response']})
+        return site_settings
 
-    if not os.path.exists(NETWORK_STATE_PATH):
-        # Create a new directory because it does not exist
-        os.makedirs(NETWORK_STATE_PATH)
+    sites_settings = catalyst_center_apis.ordered_map(get_site_settings, site_list, CATALYST_CENTER_WORKERS)
+    if NETWORK_SETTINGS_EXPANDED:
+        return sites_settings
+    parent_sites = {network_state_files.get_parent_site(site['site_name_hierarchy']) for site in site_list}
+    return network_state_files.compact_network_settings(sites_settings, parent_sites)
 
-    # create a report with each Catalyst Center state file
-    report = []
 
-    # delete existing report if any
-    if os.path.exists(NETWORK_STATE_PATH + 'report.json'):
-        os.remove(NETWORK_STATE_PATH + 'report.json')
+def is_not_in_fabric_error(error):
+    """
+    This function will identify the device role API answer for a device not in a fabric: an error response with a
+    description about the fabric, example "Device is not provisioned to any fabric"
+    :param error: exception
+    :return: True if the device is not in a fabric, False for the other errors
+    """
+    status_code = catalyst_center_apis.get_error_status_code(error)
+    details = getattr(error, 'details', None)
+    if status_code not in NOT_IN_FABRIC_STATUS_CODES or not isinstance(details, dict):
+        return False
+    return 'fabric' in str(details.get('description', '')).lower()
 
-    # create a DNACenterAPI "Connection Object" to use the Python SDK
-    catalyst_center_api = DNACenterAPI(username=CATALYST_CENTER_USER, password=CATALYST_CENTER_PASS,
-                                       base_url=CATALYST_CENTER_URL, version='2.3.5.3', verify=False)
 
-    # collect device inventory
-    # get the device count
-    response = catalyst_center_api.devices.get_device_count()
-    device_count = response['response']
-    logging.info(' Number of devices managed by Cisco Catalyst Center: ' + str(device_count))
+# noinspection PyBroadException
+def get_device_site_index(catalyst_center_api, site_list):
+    """
+    This function will create an index of device id to site hierarchy, using the site membership API for each site.
+    Site membership may include the devices assigned to the child sites, the most specific site will be selected
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param site_list: list of sites, {'site_name_hierarchy', 'site_id'}
+    :return: {device_id: site_name_hierarchy}
+    """
+    site_names = {site['site_id']: site['site_name_hierarchy'] for site in site_list}
 
-    # get the device info list
-    offset = 1
-    limit = 500
-    device_list = []
-    while offset <= device_count:
-        response = catalyst_center_api.devices.get_device_list(offset=offset)
-        offset += limit
-        device_list.extend(response['response'])
-    logging.info(' Collected the device list from Cisco Catalyst Center')
+    def get_site_members(site):
+        members = []
+        offset = 1
+        limit = 500
+        while True:
+            try:
+                response = catalyst_center_api.sites.get_membership(site_id=site['site_id'], offset=offset,
+                                                                    limit=limit)
+            except Exception as error:
+                logging.error(' Unable to collect the membership for site "' + site['site_name_hierarchy'] +
+                              '": ' + str(error))
+                return members
+            page_count = 0
+            for site_devices in (response.get('device') or []):
+                member_site = site_names.get(site_devices.get('siteId'), site['site_name_hierarchy'])
+                for device in (site_devices.get('response') or []):
+                    members.append((device.get('instanceUuid') or device.get('id'), member_site))
+                    page_count += 1
+            if page_count < limit:
+                return members
+            offset += limit
+
+    site_index = {}
+    with ThreadPoolExecutor(max_workers=CATALYST_CENTER_WORKERS) as executor:
+        for members in executor.map(get_site_members, site_list):
+            for device_id, site_name_hierarchy in members:
+                # keep the most specific site, floor over building over area
+                if site_name_hierarchy.count('/') >= site_index.get(device_id, '').count('/'):
+                    site_index[device_id] = site_name_hierarchy
+    return site_index
 
-    # create device and AP inventory, it will include all Catalyst Center device details
 
-    device_inventory = []
-    ap_inventory = []
-
-    for device in device_list:
-        # select which inventory to add the device to
-        if device.family != "Unified AP":
-            device_id = device['id']
-            device_management_ip_address = device['managementIpAddress']
-            device_details = {'hostname': device['hostname']}
-            device_details.update({'device_ip': device['managementIpAddress']})
-            device_details.update({'device_id': device['id']})
-            device_details.update({'version': device['softwareVersion']})
-            device_details.update({'device_family': device['type']})
-            device_details.update({'role': device['role']})
-
-            # get the device site hierarchy
+# noinspection PyBroadException
+def get_device_details(catalyst_center_api, device, site_index=None, devices_cache=None):
+    """
+    This function will collect the details for a device: site hierarchy and SDA fabric roles.
+    The site hierarchy is looked up in the site index, the device detail API is called only for devices not indexed.
+    The SDA fabric roles are reused from the device cache, if the device did not change since the previous run.
+    Each API call failure is isolated, it will be logged and it will not abort the inventory collection, the SDA
+    fabric roles are None if not collected, and an empty list for the devices not in a fabric
+    :param catalyst_center_api: Catalyst Center API connection object
+    :param device: device info, as returned by the device list API
+    :param site_index: {device_id: site_name_hierarchy}, optional
+    :param devices_cache: DeviceCache object, optional
+    :return: device details, number of API errors
+    """
+    errors = 0
+    device_id = device['id']
+    device_management_ip_address = device['managementIpAddress']
+    device_details = {'hostname': device['hostname']}
+    device_details.update({'device_ip': device['managementIpAddress']})
+    device_details.update({'device_id': device['id']})
+    device_details.update({'version': device['softwareVersion']})
+    device_details.update({'device_family': device['type']})
+    device_details.update({'role': device['role']})
+
+    # get the device site hierarchy, fallback to the device detail API for devices missing from the index
+    site = (site_index or {}).get(device_id)
+    if site is None:
+        try:
             response = catalyst_center_api.devices.get_device_detail(identifier='uuid', search_by=device_id)
             site = response['response']['location']
-            device_details.update({'site': site})
-
-            # get the device fabric role
+        except Exception as error:
+            errors += 1
+            logging.error(' Unable to collect the site for device "' + str(device['hostname']) + '": ' + str(error))
+    device_details.update({'site': site})
+
+    # get the device fabric role, from the device cache if the device did not change
+    cached_details = devices_cache.get(device) if devices_cache else None
+    if cached_details is not None:
+        device_details.update({'sda_roles': cached_details['sda_roles']})
+        return device_details, errors
+
+    # the SDA fabric roles are None if not collected, different from a device not in fabric
+    device_sda_roles = None
+    try:
+        response = catalyst_center_api.sda.get_device_role_in_sda_fabric(
+            device_management_ip_address=device_management_ip_address)
+        device_sda_roles = response.get('roles') or []
+    except Exception as error:
+        if is_not_in_fabric_error(error):
             device_sda_roles = []
-
-            try:
-                response = catalyst_center_api.sda.get_device_role_in_sda_fabric(
-                    device_management_ip_address=device_management_ip_address)
-                device_sda_roles = response['roles']
-            except:
-                pass
-            device_details.update({'sda_roles': device_sda_roles})
-
-            device_inventory.append(device_details)
         else:
-            device_id = device['id']
-            device_details = {'hostname': device['hostname']}
-            device_details.update({'device_ip': device['managementIpAddress']})
-            device_details.update({'device_id': device['id']})
-            device_details.update({'version': device['softwareVersion']})
-            device_details.update({'device_family': device['type']})
-            device_details.update({'role': device['role']})
-
-            # get the device site hierarchy
-            response = catalyst_center_api.devices.get_device_detail(identifier='uuid', search_by=device_id)
-            site = response['response']['location']
-            device_details.update({'site': site})
-            ap_inventory.append(device_details)
+            errors += 1
+            logging.error(' Unable to collect the SDA roles for device "' + str(device['hostname']) + '": ' +
+                          str(error))
+    device_details.update({'sda_roles': device_sda_roles})
 
-            # get the device fabric role
-            device_sda_roles = []
+    # cache only the roles collected without errors
+    if devices_cache and device_sda_roles is not None:
+        devices_cache.set(device, {'sda_roles': device_sda_roles})
 
-            try:
-                response = catalyst_center_api.sda.get_device_role_in_sda_fabric(
-                    device_management_ip_address=device_management_ip_address)
-                device_sda_roles = response['roles']
-            except:
-                pass
-            device_details.update({'sda_roles': device_sda_roles})
+    return device_details, errors
 
-    logging.info(' Collected the device inventory from Cisco Catalyst Center')
 
-    # save device inventory to JSON formatted file
-    with open(NETWORK_STATE_PATH + 'device_inventory.json', 'w') as f:
-        f.write(json.dumps(device_inventory, indent=4))
-    logging.info(' Saved the device inventory to file "device_inventory.json"')
+# noinspection PyBroadException
+def collect_network_state(controller, state_path):
+    """
+    This function will collect the network state from a Catalyst Center, and save the network state files:
+    site hierarchy, device and AP inventory, network settings.
+    The changes from the previous network state files are appended to the change journal, and the network state is
+    added to the local snapshot history
+    :param controller: {'name', 'url', 'username', 'password'}
+    :param state_path: folder for the network state files
+    :return: report lines
+    """
+    report = []
+    os.makedirs(state_path, exist_ok=True)
+
+    # index the previous network state files by the record keys, before the files are saved
+    previous_snapshot = network_state_diff.index_snapshot(state_path)
 
-    # save ap inventory to JSON formatted file
-    with open(NETWORK_STATE_PATH + 'ap_inventory.json', 'w') as f:
-        f.write(json.dumps(ap_inventory, indent=4))
-    logging.info(' Saved the AP inventory to file "ap_inventory.json"')
+    # create a DNACenterAPI "Connection Object" to use the Python SDK, with adaptive concurrency and retries
+    catalyst_center_api = DNACenterAPI(username=controller['username'], password=controller['password'],
+                                       base_url=controller['url'], version='2.3.5.3', verify=False,
+                                       wait_on_rate_limit=False, session=catalyst_center_apis.create_session())
+    catalyst_center_api = catalyst_center_apis.AdaptiveApi(catalyst_center_api)
 
     # collect site hierarchy
     # get number of sites
@@ -186,9 +261,9 @@ def main():
     global_site_id = response['response'][0]['id']
     logging.info(' Global site id: ' + global_site_id)
 
-    # get all the sites
-    response = catalyst_center_api.sites.get_site()
-    site_hierarchy = response['response']
+    # get all the sites, pages retrieved concurrently
+    site_hierarchy = catalyst_center_apis.get_paged_items(catalyst_center_api.sites.get_site, sites_number,
+                                                          CATALYST_CENTER_WORKERS)
 
     site_list = []
     for site in site_hierarchy:
@@ -199,24 +274,198 @@ def main():
     site_list_sorted = sorted(site_list, key=lambda x: x['site_name_hierarchy'])
 
     # save site_hierarchy to JSON formatted file
-    with open(NETWORK_STATE_PATH + 'site_hierarchy.json', 'w') as f:
-        f.write(json.dumps(site_list_sorted, indent=4))
-    logging.info(' Saved the site hierarchy to file "site_hierarchy.json"')
-
-    # collect network settings
-    network_settings = []
-    for site in site_list_sorted:
-        site_id = site['site_id']
-        site_name_hierarchy = site['site_name_hierarchy']
-        response = catalyst_center_api.network_settings.get_network_v2(site_id=site_id)
-        site_settings = {'site_name_hierarchy': site_name_hierarchy}
-        site_settings.update({'network_settings': response['response']})
-        network_settings.append(site_settings)
+    site_hierarchy_file = network_state_files.get_file_name('site_hierarchy')
+    network_state_files.write_records(state_path + site_hierarchy_file, site_list_sorted)
+    logging.info(' Saved the site hierarchy to file "' + site_hierarchy_file + '"')
 
-    # save network settings to JSON formatted file
-    with open(NETWORK_STATE_PATH + 'network_settings.json', 'w') as f:
-        f.write(json.dumps(network_settings, indent=4))
-    logging.info(' Saved the site hierarchy to file "network_settings.json"')
+    # collect device inventory
+    # get the device count
+    response = catalyst_center_api.devices.get_device_count()
+    device_count = response['response']
+    logging.info(' Number of devices managed by Cisco Catalyst Center: ' + str(device_count))
+
+    # build the device to site index from the site membership, bulk calls instead of one call per device
+    site_index = get_device_site_index(catalyst_center_api, site_list_sorted)
+    logging.info(' Collected the site membership for ' + str(len(site_index)) + ' devices')
+
+    # create device and AP inventory, it will include all Catalyst Center device details
+    # the device list pages are streamed to the per-device API calls, fanned out to a bounded pool of workers,
+    # and each device is saved to the inventory file as soon as collected, in device list order
+    # the SDA fabric roles for the devices not changed since the previous run are reused from the device cache
+    devices_cache = device_cache.DeviceCache(controller['url'])
+    enrichment_errors = 0
+    device_inventory_file = network_state_files.get_file_name('device_inventory')
+    ap_inventory_file = network_state_files.get_file_name('ap_inventory')
+    with network_state_files.get_record_writer(state_path, 'device_inventory', 'site') as device_writer, \
+            network_state_files.get_record_writer(state_path, 'ap_inventory', 'site') as ap_writer:
+        for device, device_details, errors in catalyst_center_apis.ordered_map(
+                lambda item: (item,) + get_device_details(catalyst_center_api, item, site_index, devices_cache),
+                get_device_list(catalyst_center_api, device_count), CATALYST_CENTER_WORKERS * 2, DEVICE_WINDOW):
+            enrichment_errors += errors
+            # select which inventory to add the device to
+            if device['family'] != "Unified AP":
+                device_writer.write(device_details)
+            else:
+                ap_writer.write(device_details)
+
+    devices_cache.save()
+    if devices_cache.ttl > 0:
+        cache_summary = ('Device cache: ' + str(devices_cache.hits) + ' devices reused, ' +
+                         str(devices_cache.misses) + ' devices collected, ' + str(devices_cache.get_removed_count()) +
+                         ' devices removed or not cached')
+        logging.info(' ' + cache_summary)
+        report.append('    ' + cache_summary)
+    if enrichment_errors:
+        logging.info(' Device enrichment API errors: ' + str(enrichment_errors))
+        report.append('    Device enrichment API errors: ' + str(enrichment_errors))
+    logging.info(' Collected the device inventory from Cisco Catalyst Center')
+    logging.info(' Saved the device inventory to file "' + device_inventory_file + '"')
+    logging.info(' Saved the AP inventory to file "' + ap_inventory_file + '"')
+
+    # collect network settings, each site settings saved as soon as collected
+    network_settings_file = network_state_files.get_file_name('network_settings')
+    with network_state_files.get_record_writer(state_path, 'network_settings', 'site_name_hierarchy') as writer:
+        for site_settings in get_network_settings(catalyst_center_api, site_list_sorted):
+            writer.write(site_settings)
+    logging.info(' Saved the site hierarchy to file "' + network_settings_file + '"')
+
+    # compare with the previous network state files, each record change appended to the change journal
+    changes_summary = network_state_diff.diff_snapshot(state_path, previous_snapshot,
+                                                       prefix=controller['name'] + '/' if controller['name'] else '')
+    for file_name, counts in changes_summary.items():
+        report.append('    Changes for file: ' + file_name + ', added: ' + str(counts['added']) + ', removed: ' +
+                      str(counts['removed']) + ', modified: ' + str(counts['modified']))
+
+    # add the network state to the local snapshot history, only the new records are saved
+    if network_state_history.NETWORK_STATE_HISTORY_PATH:
+        history_store = network_state_history.SnapshotStore()
+        history_store.add_snapshot(state_path, controller['name'])
+        report.append('    Snapshot history: ' + str(history_store.new_objects) + ' new objects')
+
+    return report
+
+
+# noinspection PyBroadException
+def collect_controller_network_state(controller, state_path):
+    """
+    This function will collect the network state for a Catalyst Center in a worker process, a failure will be
+    reported and it will not abort the collection for the other controllers
+    :param controller: {'name', 'url', 'username', 'password'}
+    :param state_path: folder for the network state files
+    :return: report lines, True if the collection failed, API calls metrics and calls timeline for the worker process
+    """
+    logging.basicConfig(level=logging.INFO)
+    start_time = time.monotonic()
+    failed = False
+    try:
+        report = collect_network_state(controller, state_path)
+        report.append('    Collected in ' + str(round(time.monotonic() - start_time, 2)) + ' seconds')
+    except Exception as error:
+        logging.error(' Catalyst Center "' + controller['name'] + '" collection failed: ' + str(error))
+        report = ['    Collection failed: ' + str(error)]
+        failed = True
+    return report, failed, api_metrics.api_metrics.get_endpoints(), api_metrics.api_metrics.get_trace_events()
+
+
+def get_controllers(controllers_file):
+    """
+    This function will return the list of controllers from the controllers file, a JSON list of
+    {'name', 'url', 'username', 'password'}. The username and password default to CATALYST_CENTER_USER and
+    CATALYST_CENTER_PASS, the name defaults to the controller host name
+    :param controllers_file: controllers file path
+    :return: list of controllers
+    """
+    with open(controllers_file) as f:
+        controllers_list = json.load(f)
+    if not isinstance(controllers_list, list) or not controllers_list:
+        raise ValueError('No controllers in ' + controllers_file + ', expected a JSON list of controllers')
+    controllers = []
+    names = set()
+    for controller in controllers_list:
+        if not isinstance(controller, dict) or not controller.get('url'):
+            raise ValueError('Controller without url in ' + controllers_file)
+        name = controller.get('name') or urlparse(controller['url']).hostname
+        # the name is used as the folder for the controller network state files
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+        if name in names:
+            raise ValueError('Duplicate controller name "' + name + '" in ' + controllers_file)
+        names.add(name)
+        controllers.append({'name': name, 'url': controller['url'],
+                            'username': controller.get('username', CATALYST_CENTER_USER),
+                            'password': controller.get('password', CATALYST_CENTER_PASS)})
+    return controllers
+
+
+# noinspection PyBroadException
+def main():
+    """
+    This app will sync Catalyst Center state documented as code to a GitHub repo:
+     - multi-controller mode, if CATALYST_CENTER_CONTROLLERS configured: each Catalyst Center collected in a worker
+       process, to a folder for each Catalyst Center
+     - retrieve the Catalyst Center Site hierarchy for all sites
+     - collect the Catalyst Center device inventory
+     - collect the network settings for all sites
+     - identify if the specific repository exists in GitHub
+     - it will commit the new or updated network state files
+     - at the end of execution a report will be created
+    This app may be part of a CI/CD pipeline to run on-demand or scheduled.
+
+    This app is using the Python SDK to make REST API calls to Cisco Catalyst Center.
+
+    """
+
+    # logging, debug level, to file {application_run.log}
+    logging.basicConfig(level=logging.INFO)
+
+    current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logging.info(' Application "catalyst_center_network_state_sync.py" Start, ' + current_time)
+
+    # verify if folder for state files exist
+
+    if not os.path.exists(NETWORK_STATE_PATH):
+        # Create a new directory because it does not exist
+        os.makedirs(NETWORK_STATE_PATH)
+
+    # create a report with each Catalyst Center state file
+    report = []
+
+    # delete existing report if any
+    if os.path.exists(NETWORK_STATE_PATH + 'report.json'):
+        os.remove(NETWORK_STATE_PATH + 'report.json')
+
+    # folders of the failed controllers, not pushed, and the folders of the network state files
+    failed_folders = []
+    state_folders = ['']
+    if CATALYST_CENTER_CONTROLLERS:
+        # multi-controller mode, each controller collected in a worker process, to a folder for each controller
+        try:
+            controllers = get_controllers(CATALYST_CENTER_CONTROLLERS)
+        except (OSError, ValueError) as error:
+            logging.error(' Invalid controllers file "' + CATALYST_CENTER_CONTROLLERS + '": ' + str(error))
+            sys.exit(1)
+        logging.info(' Collecting the network state from ' + str(len(controllers)) + ' Catalyst Center controllers')
+        with ProcessPoolExecutor(max_workers=len(controllers),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(collect_controller_network_state, controller,
+                                       NETWORK_STATE_PATH + controller['name'] + '/') for controller in controllers]
+            for controller, future in zip(controllers, futures):
+                try:
+                    controller_report, failed, endpoints, trace_events = future.result()
+                    api_metrics.api_metrics.merge(endpoints, trace_events)
+                except Exception as error:
+                    controller_report, failed = ['    Collection failed: ' + str(error)], True
+                if failed:
+                    # the files of a failed controller may be missing or partial, the repo files are kept
+                    failed_folders.append(controller['name'] + '/')
+                    controller_report.append('    Files not pushed, the previous files in the repo are kept')
+                report.append('    Catalyst Center "' + controller['name'] + '":')
+                report.extend(controller_report)
+        state_folders = [controller['name'] + '/' for controller in controllers
+                         if controller['name'] + '/' not in failed_folders]
+    else:
+        controller = {'name': None, 'url': CATALYST_CENTER_URL, 'username': CATALYST_CENTER_USER,
+                      'password': CATALYST_CENTER_PASS}
+        report.extend(collect_network_state(controller, NETWORK_STATE_PATH))
 
     # get the repos for user
     repos = github_apis.get_private_repos(username=GITHUB_USERNAME, github_token=GITHUB_TOKEN)
@@ -227,28 +476,49 @@ def main():
         return
     logging.info(' Repo "' + GITHUB_REPO + '" found!')
 
-    # push all files to GitHub repo
+    # push all files to GitHub repo, including the files in the controllers folders, except the failed controllers
     os.chdir(NETWORK_STATE_PATH)
-    files_list = os.listdir()
-
-    # Git push network state files
-
+    failed_folders = tuple(failed_folders)
+    files_list = []
+    for folder, folders, files in os.walk('.'):
+        for filename in files:
+            filename = os.path.relpath(os.path.join(folder, filename)).replace(os.sep, '/')
+            if not filename.startswith(failed_folders):
+                files_list.append(filename)
+    files_list.sort()
+
+    # get the blob SHA for the files in the repo, a single tree API call
+    repo_files_sha = github_apis.get_repo_tree(username=GITHUB_USERNAME, repo_name=GITHUB_REPO)
+
+    # Git push network state files, only the files different from the repo version, in a single commit
+    push_files = {}
+
+    # remove the repo files replaced by a layout or format change, monolithic files or shards with no records
+    local_files = set(files_list)
+    for filename in sorted(repo_files_sha):
+        if filename not in local_files and network_state_files.is_layout_file(filename, tuple(state_folders)):
+            push_files[filename] = None
+            report.append('    GitHub push for file: ' + filename + ', removed')
     for filename in files_list:
-        try:
-            contents = github_apis.get_repo_file_content(username=GITHUB_USERNAME, repo_name=GITHUB_REPO, file_name=filename)
-            update = True
-        except:
-            update = False  # file does not exist
+        update = filename in repo_files_sha
+        if update and repo_files_sha[filename] == github_apis.get_git_blob_sha(filename):
+            report.append('    GitHub push for file: ' + filename + ', unchanged')
+            continue
 
         with open(filename) as f:
-            file_content = f.read()
-
-        # create or push the file
-        github_apis.github_push(github_repo=GITHUB_REPO, filename=filename,
-                                message="committed by Jenkins - Network State Sync", content=file_content,
-                                update=update)
+            push_files[filename] = f.read()
         report.append('    GitHub push for file: ' + filename + ', file existing: ' + str(update))
 
+    # create or push the files
+    commit_sha = github_apis.github_push_files(github_repo=GITHUB_REPO, files=push_files,
+                                               message="committed by Jenkins - Network State Sync")
+    if commit_sha:
+        report.append('    GitHub commit: ' + commit_sha)
+
+    # API calls metrics for each endpoint
+    report.extend(api_metrics.get_report_lines())
+    api_metrics.save_metrics()
+
     logging.info(' Catalyst Center Network State Sync Report:')
     for item in report:
         logging.info(item)
@@ -258,6 +528,10 @@ def main():
         f.write(json.dumps(report, indent=4))
     logging.info(' Saved the report to file "report.json"')
 
+    cache_stats = github_apis.get_cache_stats()
+    logging.info(' GitHub conditional requests, cache hits: ' + str(cache_stats['hits']) + ', cache misses: ' +
+                 str(cache_stats['misses']))
+
     date_time = str(datetime.now().replace(microsecond=0))
     logging.info(' End of Application "catalyst_center_network_state_sync.py" Run: ' + date_time)
 
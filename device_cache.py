@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv('environment.env')
+
+# folder for the device cache files, one file for each Catalyst Center
+DEVICE_CACHE_PATH = os.path.abspath(os.getenv('DEVICE_CACHE_PATH', '.device_cache/'))
+
+# maximum age of a cached device entry, seconds, 0 to disable the device cache
+DEVICE_CACHE_TTL = int(os.getenv('DEVICE_CACHE_TTL', 86400))
+
+
+def get_device_version(device):
+    """
+    This function will return the device version used to validate the cached entries, the device last update time
+    :param device: device info, as returned by the device list API
+    :return: device version, None if the device list API did not return the last update time
+    """
+    version = device.get('lastUpdateTime') or device.get('lastUpdated')
+    if version is None:
+        return None
+    return str(version)
+
+
+class DeviceCache:
+    """
+    This class will cache the device details collected with the per-device API calls, keyed by device id and validated
+    with the device last update time and management IP address, from the device list API.
+    Only the devices in the current device list are saved, the removed devices are dropped from the cache
+    """
+
+    def __init__(self, catalyst_center_url, ttl=DEVICE_CACHE_TTL):
+        """
+        :param catalyst_center_url: Catalyst Center URL, each Catalyst Center has a different cache file
+        :param ttl: maximum age of a cached entry, seconds, 0 to disable the cache
+        """
+        self.cache_file = os.path.join(DEVICE_CACHE_PATH, 'device_cache_' +
+                                       hashlib.sha256(str(catalyst_center_url).encode()).hexdigest()[:16] + '.json')
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.new_entries = {}
+        self.hits = 0
+        self.misses = 0
+        if ttl <= 0:
+            return
+        try:
+            with open(self.cache_file) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, device):
+        """
+        This method will return the cached details for a device, if the device did not change and the entry is not
+        older than the TTL
+        :param device: device info, as returned by the device list API
+        :return: cached device details, None if not cached
+        """
+        version = get_device_version(device)
+        with self.lock:
+            entry = self.entries.get(device['id'])
+            if (entry is None or version is None or entry['version'] != version or
+                    entry['ip'] != device['managementIpAddress'] or time.time() - entry['cached_time'] >= self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.new_entries[device['id']] = entry
+            return copy.deepcopy(entry['details'])
+
+    def set(self, device, details):
+        """
+        This method will cache the details for a device, collected without errors
+        :param device: device info, as returned by the device list API
+        :param details: device details
+        :return:
+        """
+        version = get_device_version(device)
+        if self.ttl <= 0 or version is None:
+            return
+        entry = {'version': version, 'ip': device['managementIpAddress'], 'cached_time': time.time(),
+                 'details': copy.deepcopy(details)}
+        with self.lock:
+            self.new_entries[device['id']] = entry
+
+    def get_removed_count(self):
+        """
+        This method will return the number of cached devices not in the current device list, or not collected
+        :return: number of devices
+        """
+        with self.lock:
+            return len(set(self.entries) - set(self.new_entries))
+
+    def save(self):
+        """
+        This method will save the cache for the devices in the current device list, it must be called after the
+        device inventory is collected
+        :return:
+        """
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            entries = dict(self.new_entries)
+        try:
+            os.makedirs(DEVICE_CACHE_PATH, exist_ok=True)
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(entries, f)
+            os.replace(temp_file, self.cache_file)
+        except OSError as error:
+            logging.warning(' Unable to save the device cache: ' + str(error))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import base64
+import logging
+import os
+import subprocess
+
+from dotenv import load_dotenv
+
+load_dotenv('environment.env')
+
+GITHUB_USERNAME = os.getenv('GITHUB_USERNAME')
+GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+
+# folder for the local mirror clones of the GitHub repos, mirror mode is disabled if not configured
+GITHUB_MIRROR_PATH = os.getenv('GITHUB_MIRROR_PATH')
+# optional repo URL for the mirror, example a local bare repo, default the GitHub repo URL
+GITHUB_MIRROR_URL = os.getenv('GITHUB_MIRROR_URL')
+
+GITHUB_WEB_URL = 'https://github.com'
+
+
+def get_git_env(git_config=None):
+    """
+    This function will return the environment for the git commands. The git configuration is passed in the
+    environment, not on the command line, the credentials are not visible in the processes list
+    :param git_config: optional git configuration, {key: value}
+    :return: environment
+    """
+    # UTC dates, same format as the GitHub API
+    env = dict(os.environ, TZ='UTC')
+    if git_config:
+        env['GIT_CONFIG_COUNT'] = str(len(git_config))
+        for index, (key, value) in enumerate(git_config.items()):
+            env['GIT_CONFIG_KEY_' + str(index)] = key
+            env['GIT_CONFIG_VALUE_' + str(index)] = value
+    return env
+
+
+def run_git(mirror_path, *args, git_config=None):
+    """
+    This function will run a git command for the mirror repo
+    :param mirror_path: mirror repo folder
+    :param args: git command and arguments
+    :param git_config: optional git configuration, {key: value}
+    :return: command output
+    """
+    command = ['git', '--git-dir=' + mirror_path] + list(args)
+    return subprocess.run(command, check=True, capture_output=True, env=get_git_env(git_config)).stdout.decode('utf-8')
+
+
+def get_mirror_path(repo_name):
+    """
+    This function will return the mirror folder for a repo
+    :param repo_name: repository name
+    :return: mirror repo folder
+    """
+    return os.path.join(GITHUB_MIRROR_PATH, repo_name + '.git')
+
+
+def sync_mirror(username, repo_name, url=None):
+    """
+    This function will clone the repo as a local mirror, or fetch the updates if the mirror exists
+    :param username: repo owner
+    :param repo_name: repository name
+    :param url: repo URL, default GITHUB_MIRROR_URL or the GitHub repo URL
+    :return: mirror repo folder, None if unable to clone or fetch the repo
+    """
+    mirror_path = get_mirror_path(repo_name)
+    url = url or GITHUB_MIRROR_URL or GITHUB_WEB_URL + '/' + username + '/' + repo_name + '.git'
+    git_config = {}
+    if GITHUB_TOKEN and url.startswith(GITHUB_WEB_URL):
+        credentials = base64.b64encode((GITHUB_USERNAME + ':' + GITHUB_TOKEN).encode()).decode()
+        git_config = {'http.extraHeader': 'Authorization: Basic ' + credentials}
+    try:
+        if os.path.exists(mirror_path):
+            run_git(mirror_path, 'fetch', '--prune', url, '+refs/heads/*:refs/heads/*', git_config=git_config)
+        else:
+            os.makedirs(GITHUB_MIRROR_PATH, exist_ok=True)
+            subprocess.run(['git', 'clone', '--mirror', '--quiet', url, mirror_path], check=True,
+                           capture_output=True, env=get_git_env(git_config))
+    except (OSError, subprocess.CalledProcessError) as error:
+        logging.error(' Unable to sync the mirror for repo "' + repo_name + '": ' + str(error))
+        return None
+    return mirror_path
+
+
+def get_repo_content(mirror_path, branch='main'):
+    """
+    This function will return the contents of the repository, all files including the files in subfolders
+    :param mirror_path: mirror repo folder
+    :param branch: branch name
+    :return: files_list, files paths
+    """
+    return run_git(mirror_path, 'ls-tree', '-r', '--name-only', '-z', branch).split('\x00')[:-1]
+
+
+def get_repo_file_content(mirror_path, file_name, branch='main'):
+    """
+    This function will return the content of the file from the repo
+    :param mirror_path: mirror repo folder
+    :param file_name: file name
+    :param branch: branch name
+    :return: return the file content
+    """
+    return run_git(mirror_path, 'show', branch + ':' + file_name)
+
+
+def get_files_last_commit(mirror_path, username, repo_name, files_list, branch='main'):
+    """
+    This function will return the last commit for each file, same details as github_apis.get_files_last_commit.
+    The commits history is read from the newest commit and it stops as soon as all files have been found
+    :param mirror_path: mirror repo folder
+    :param username: repo owner
+    :param repo_name: repository name
+    :param files_list: list of files paths
+    :param branch: branch name
+    :return: {file path: commit details}, files not found in the commits history are not included
+    """
+    files_sha = {}
+    pending_files = set(files_list)
+    command = ['git', '-c', 'core.quotePath=false', '--git-dir=' + mirror_path, 'log', '--format=%x01%H',
+               '--name-only', '--no-renames', branch]
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        sha = None
+        for line in process.stdout:
+            line = line.rstrip('\n')
+            if line.startswith('\x01'):
+                sha = line[1:]
+            elif line in pending_files:
+                pending_files.remove(line)
+                files_sha[line] = sha
+                if not pending_files:
+                    process.kill()
+                    break
+
+    commits_info = {}
+    for sha in set(files_sha.values()):
+        commit_author, commit_date, commit_message = run_git(
+            mirror_path, 'show', '-s', '--format=%ae%x00%ad%x00%B', '--date=format-local:%Y-%m-%dT%H:%M:%SZ',
+            sha).split('\x00', 2)
+        commits_info[sha] = {'date': commit_date, 'message': commit_message.rstrip('\n'),
+                             'url': GITHUB_WEB_URL + '/' + username + '/' + repo_name + '/commit/' + sha,
+                             'author': commit_author}
+
+    files_commit = {}
+    for file_name, sha in files_sha.items():
+        # the patch, without the diff header, same as the GitHub API
+        patch = run_git(mirror_path, 'show', '--format=', '--no-renames', sha, '--', file_name)
+        hunk_index = patch.find('\n@@')
+        commit_diff = patch[hunk_index + 1:].rstrip('\n') if hunk_index >= 0 else ''
+        files_commit[file_name] = dict(commits_info[sha], filename=file_name, diff=commit_diff)
+    return files_commit
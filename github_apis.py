@@ -20,13 +20,24 @@ __version__ = "0.1.0"
 __copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.1"
 
+import atexit
 import base64
+import hashlib
+import json
+import logging
 import os
+import re
+import threading
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 from github import Github
+from requests.adapters import HTTPAdapter
+
+import api_metrics
 
 load_dotenv('environment.env')
 
@@ -41,7 +52,272 @@ GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
 time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
 
-GITHUB_URL = 'https://api.github.com'
+GITHUB_URL = os.getenv('GITHUB_URL', 'https://api.github.com')
+
+# number of pooled keep-alive connections to GitHub
+GITHUB_POOL_SIZE = int(os.getenv('GITHUB_POOL_SIZE', '10'))
+# folder for the cached GitHub API responses, used for the ETag/Last-Modified conditional requests
+GITHUB_CACHE_PATH = os.path.abspath(os.getenv('GITHUB_CACHE_PATH', '.github_cache/'))
+
+# response headers saved with the cached responses, restored when the cached response is served
+CACHED_HEADERS = ('Link', 'Content-Type')
+
+# number of concurrent GitHub API calls
+GITHUB_WORKERS = int(os.getenv('GITHUB_WORKERS', '10'))
+
+# shared HTTP session for all GitHub API calls
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=GITHUB_POOL_SIZE, pool_maxsize=GITHUB_POOL_SIZE))
+session.mount('http://', HTTPAdapter(pool_connections=GITHUB_POOL_SIZE, pool_maxsize=GITHUB_POOL_SIZE))
+
+# conditional requests counters: hits - 304 responses served from cache, misses - full responses
+cache_stats = {'hits': 0, 'misses': 0}
+cache_stats_lock = threading.Lock()
+
+# commits details loaded from the cache files, {cache file: {commit SHA: commit details}}
+commits_caches = {}
+
+# commits cache format version, part of the cache file name, it must be changed when the commit details change
+COMMITS_CACHE_VERSION = 1
+
+# requests priority: the reads needed by the current run, and the optional metadata, example commits details
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+# part of the rate limit reserved for the high priority requests
+GITHUB_RATE_LIMIT_RESERVE = float(os.getenv('GITHUB_RATE_LIMIT_RESERVE', '0.1'))
+# number of retries for the rate limited requests
+GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', '3'))
+# messages of the 403 responses for the secondary rate limits, the other 403 responses are not retried
+SECONDARY_RATE_LIMIT_MESSAGES = ('secondary rate limit', 'abuse detection')
+
+
+class RateLimitScheduler:
+    """
+    This class will schedule the GitHub API requests using the rate limit headers of the responses, as a token bucket:
+    the tokens are the remaining requests, refilled at the rate limit reset time.
+    The low priority requests will wait when the remaining requests are within the reserve for the high priority
+    requests. The secondary rate limits, 403 or 429 responses, block all requests for the Retry-After time, or for
+    60 seconds if the response has no Retry-After header.
+    The rate limit state is saved to the cache folder, for the next runs using the same token
+    """
+
+    def __init__(self, state_file):
+        """
+        :param state_file: rate limit state file path
+        """
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.limit = None
+        self.remaining = None
+        self.reset = 0
+        self.blocked_until = 0
+        self.saved_time = 0
+        try:
+            with open(state_file) as f:
+                state = json.load(f)
+            if state['reset'] > time.time():
+                self.limit = state['limit']
+                self.remaining = state['remaining']
+                self.reset = state['reset']
+            self.blocked_until = state.get('blocked_until', 0)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def acquire(self, priority=PRIORITY_HIGH):
+        """
+        This method will wait until a request with the priority may be sent, and it will take a token
+        :param priority: PRIORITY_HIGH or PRIORITY_LOW
+        :return:
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                if self.remaining is not None and now >= self.reset:
+                    # rate limit window reset, the bucket is full
+                    self.remaining = self.limit
+                reserve = 0
+                if priority == PRIORITY_LOW and self.limit:
+                    reserve = int(self.limit * GITHUB_RATE_LIMIT_RESERVE)
+                if now >= self.blocked_until and (self.remaining is None or self.remaining > reserve):
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    return
+                wait_until = self.blocked_until if now < self.blocked_until else self.reset
+            logging.info(' GitHub rate limit, waiting ' + str(round(wait_until - now, 1)) + ' seconds')
+            time.sleep(max(wait_until - now, 0.1))
+
+    def update(self, response):
+        """
+        This method will update the rate limit state from the response headers
+        :param response: GitHub API response
+        :return: seconds to wait before retry, None if the request was not rate limited
+        """
+        headers = response.headers
+        retry_after = None
+        with self.lock:
+            now = time.time()
+            if 'X-RateLimit-Remaining' in headers:
+                self.limit = int(headers.get('X-RateLimit-Limit', self.limit or 0))
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+                self.reset = int(headers.get('X-RateLimit-Reset', self.reset))
+            if response.status_code in (403, 429):
+                if 'Retry-After' in headers:
+                    retry_after = int(headers['Retry-After'])
+                elif self.remaining == 0:
+                    retry_after = max(self.reset - now, 1)
+                elif response.status_code == 429 or any(message in response.text.lower()
+                                                        for message in SECONDARY_RATE_LIMIT_MESSAGES):
+                    retry_after = 60
+                if retry_after is not None:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+            if retry_after is not None or now - self.saved_time > 5:
+                self.save()
+        return retry_after
+
+    def save(self):
+        """
+        This method will save the rate limit state to the state file, it must be called with the lock acquired
+        :return:
+        """
+        self.saved_time = time.time()
+        state = {'limit': self.limit, 'remaining': self.remaining, 'reset': self.reset,
+                 'blocked_until': self.blocked_until}
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            temp_file = self.state_file + '.' + str(threading.get_ident()) + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(state, f)
+            os.replace(temp_file, self.state_file)
+        except OSError as error:
+            logging.warning(' Unable to save the GitHub rate limit state: ' + str(error))
+
+
+# rate limit scheduler for all GitHub API calls, the state is shared with the other runs using the same token
+rate_limit_scheduler = RateLimitScheduler(
+    os.path.join(GITHUB_CACHE_PATH, 'rate_limit_' + hashlib.sha256(str(GITHUB_TOKEN).encode()).hexdigest()[:16] +
+                 '.json'))
+
+
+def save_rate_limit_state():
+    """
+    This function will save the rate limit state at exit, for the next runs
+    :return:
+    """
+    with rate_limit_scheduler.lock:
+        if rate_limit_scheduler.remaining is not None:
+            rate_limit_scheduler.save()
+
+
+atexit.register(save_rate_limit_state)
+
+
+def get_endpoint_name(method, url):
+    """
+    This function will return the endpoint name for the API calls metrics, the URL path without the owner, repo,
+    SHA, ref and file path values, example "github.GET /repos/{repo}/git/trees/{ref}"
+    :param method: HTTP method
+    :param url: request URL
+    :return: endpoint name
+    """
+    path = urlparse(url).path
+    path = re.sub(r'^/repos/[^/]+/[^/]+', '/repos/{repo}', path)
+    path = re.sub(r'^/users/[^/]+', '/users/{user}', path)
+    path = re.sub(r'/contents/.*$', '/contents/{path}', path)
+    path = re.sub(r'/(trees|branches|heads)/.+$', r'/\1/{ref}', path)
+    path = re.sub(r'/[0-9a-f]{40}$', '/{sha}', path)
+    return 'github.' + method + ' ' + path
+
+
+def github_request(method, url, header, priority=PRIORITY_HIGH, **kwargs):
+    """
+    This function will send a request using the shared session, scheduled by the rate limit scheduler.
+    Rate limited requests are retried after the Retry-After or the rate limit reset time
+    :param method: HTTP method
+    :param url: request URL
+    :param header: request headers
+    :param priority: PRIORITY_HIGH or PRIORITY_LOW
+    :param kwargs: other requests parameters, example json, stream
+    :return: response
+    """
+    endpoint = get_endpoint_name(method, url) if api_metrics.API_METRICS else None
+    for retry in range(GITHUB_MAX_RETRIES + 1):
+        rate_limit_scheduler.acquire(priority)
+        start_time = time.monotonic()
+        response = session.request(method, url, headers=header, verify=True, **kwargs)
+        api_metrics.record(endpoint, start_time, time.monotonic() - start_time,
+                           api_metrics.get_response_size(response, kwargs.get('stream')) if endpoint else 0,
+                           response.status_code >= 400, retry > 0)
+        retry_after = rate_limit_scheduler.update(response)
+        if retry_after is None or retry == GITHUB_MAX_RETRIES:
+            return response
+        logging.warning(' GitHub rate limited request: ' + url + ', retry after ' + str(round(retry_after, 1)) +
+                        ' seconds')
+        response.close()
+
+
+def get_cache_stats():
+    """
+    This function will return the conditional requests counters
+    :return: {'hits': number of 304 responses served from cache, 'misses': number of full responses}
+    """
+    with cache_stats_lock:
+        return dict(cache_stats)
+
+
+def github_get(url, header, priority=PRIORITY_HIGH):
+    """
+    This function will send a GET request using github_request. Responses with ETag or Last-Modified headers are
+    saved to the cache folder, and the next request for the same URL is sent as a conditional request.
+    A 304 response, not counted by GitHub against the rate limit, is replaced with the cached response
+    :param url: request URL
+    :param header: request headers
+    :param priority: PRIORITY_HIGH or PRIORITY_LOW
+    :return: response
+    """
+    cache_key = hashlib.sha256((url + '|' + header.get('Accept', '') + '|' + header.get('Authorization', '')).encode())
+    cache_key = cache_key.hexdigest()
+    cache_file = os.path.join(GITHUB_CACHE_PATH, cache_key + '.json')
+    cached = None
+    request_header = dict(header)
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+        if 'headers' not in cached:
+            # entry saved without the response headers, the pagination links would be lost
+            raise ValueError('cache entry without headers')
+        if cached.get('etag'):
+            request_header['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            request_header['If-Modified-Since'] = cached['last_modified']
+    except (OSError, ValueError):
+        cached = None
+
+    response = github_request('GET', url, request_header, priority)
+
+    if response.status_code == 304 and cached is not None:
+        with cache_stats_lock:
+            cache_stats['hits'] += 1
+        response.status_code = 200
+        response._content = base64.b64decode(cached['content'])
+        # the 304 response may not include the pagination and content headers of the cached response
+        for name, value in cached['headers'].items():
+            response.headers[name] = value
+        return response
+
+    with cache_stats_lock:
+        cache_stats['misses'] += 1
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if response.status_code == 200 and (etag or last_modified):
+        cached = {'url': url, 'etag': etag, 'last_modified': last_modified,
+                  'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+                  'content': base64.b64encode(response.content).decode()}
+        os.makedirs(GITHUB_CACHE_PATH, exist_ok=True)
+        temp_file = cache_file + '.' + str(threading.get_ident()) + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(cached, f)
+        os.replace(temp_file, cache_file)
+    return response
 
 
 def get_repos(username):
@@ -52,7 +328,7 @@ def get_repos(username):
     """
     url = GITHUB_URL + '/users/' + username + '/repos?per_page=100&sort=updated&direction=desc'
     header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
+    response = github_get(url, header)
     response_json = response.json()
     repos_list = []
     for repo in response_json:
@@ -69,7 +345,7 @@ def get_private_repos(username, github_token):
     """
     url = GITHUB_URL + '/user/repos?type=private'
     header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + github_token}
-    response = requests.get(url, headers=header, verify=True)
+    response = github_get(url, header)
     response_json = response.json()
     repos_list = []
     for repo in response_json:
@@ -77,26 +353,24 @@ def get_private_repos(username, github_token):
     return repos_list
 
 
-def get_repo_content(username, repo_name):
+def get_repo_content(username, repo_name, branch='main'):
     """
-    This function will return the contents of a repository
+    This function will return the contents of a repository, all files including the files in subfolders
     :param: username: user for which to return the repos
     :param: repo_name: repository name
-    :return: files_list
+    :param: branch: branch name
+    :return: files_list, files paths
     """
-    url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/contents'
-    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
-    response_json = response.json()
     files_list = []
-    for file in response_json:
-        files_list.append(file['name'])
+    for file in get_repo_files(username, repo_name, branch):
+        files_list.append(file['path'])
     return files_list
 
 
 def get_repo_file_content(username, repo_name, file_name):
     """
-    This function will return the content of the file from the repo
+    This function will return the content of the file from the repo.
+    Files over 1 MB are not included in the contents API response, they are downloaded using the blob SHA
     :param username: GitHub username
     :param repo_name: GitHub repo
     :param file_name: file name
@@ -104,35 +378,119 @@ def get_repo_file_content(username, repo_name, file_name):
     """
     url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/contents/' + file_name
     header = {'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header)
+    response = github_get(url, header)
     response_json = response.json()
     file_content = response_json['content']
     file_content_encoding = response_json.get('encoding')
     if file_content_encoding == 'base64':
         file_content = base64.b64decode(file_content).decode()
+    elif file_content_encoding == 'none':
+        blob_path = os.path.join(GITHUB_CACHE_PATH, 'blobs', response_json['sha'])
+        download_repo_blob(username, repo_name, response_json['sha'], blob_path)
+        with open(blob_path, encoding='utf-8') as f:
+            file_content = f.read()
     return file_content
 
 
+def get_repo_files(username, repo_name, branch='main'):
+    """
+    This function will return all the files in the repo, using a single recursive git tree API call
+    :param username: repo owner
+    :param repo_name: repository name
+    :param branch: branch name
+    :return: list of {'path', 'size', 'sha'}, empty if the repo or branch has no commits
+    """
+    url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/git/trees/' + branch + '?recursive=1'
+    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
+    response = github_get(url, header)
+    if response.status_code in (404, 409):
+        return []
+    response.raise_for_status()
+    response_json = response.json()
+    if response_json.get('truncated'):
+        logging.warning(' Repo "' + repo_name + '" tree truncated, not all files listed')
+    files_list = []
+    for item in response_json['tree']:
+        if item['type'] == 'blob':
+            files_list.append({'path': item['path'], 'size': item['size'], 'sha': item['sha']})
+    return files_list
+
+
+def get_repo_tree(username, repo_name, branch='main'):
+    """
+    This function will return the blob SHA for each file in the repo, using a single recursive git tree API call
+    :param username: repo owner
+    :param repo_name: repository name
+    :param branch: branch name
+    :return: {file path: blob SHA}, empty if the repo or branch has no commits
+    """
+    files_sha = {}
+    for file in get_repo_files(username, repo_name, branch):
+        files_sha[file['path']] = file['sha']
+    return files_sha
+
+
+def download_repo_blob(username, repo_name, sha, file_path):
+    """
+    This function will download a blob to a local file, streamed in chunks, the file content is not kept in memory.
+    The download is skipped if the local file has the same blob SHA
+    :param username: repo owner
+    :param repo_name: repository name
+    :param sha: blob SHA
+    :param file_path: local file path
+    :return: local file path
+    """
+    if os.path.exists(file_path) and get_git_blob_sha(file_path) == sha:
+        return file_path
+    url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/git/blobs/' + sha
+    header = {'Accept': 'application/vnd.github.raw', 'Authorization': 'token ' + GITHUB_TOKEN}
+    if os.path.dirname(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temp_file = file_path + '.' + str(threading.get_ident()) + '.tmp'
+    with github_request('GET', url, header, stream=True) as response:
+        response.raise_for_status()
+        with open(temp_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+    os.replace(temp_file, file_path)
+    return file_path
+
+
+def get_git_blob_sha(file_path):
+    """
+    This function will compute the git blob SHA for a local file, same value as the SHA in the git tree
+    :param file_path: local file path
+    :return: blob SHA
+    """
+    blob_sha = hashlib.sha1(('blob ' + str(os.path.getsize(file_path)) + '\0').encode())
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            blob_sha.update(chunk)
+    return blob_sha.hexdigest()
+
+
 def get_repo_commits(username, repo_name):
     """
-    This function will return the repo's commits SHA
+    This function will return the repo's commits SHA, all pages, newest commit first
     :param: username: repo owner
     :param: repo_name: repository name
     :return: SHA list
     """
-    url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/commits'
+    url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/commits?per_page=100'
     header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
-    response_json = response.json()
     sha_list = []
-    for commit in response_json:
-        sha_list.append(commit['sha'])
+    while url:
+        response = github_get(url, header)
+        response_json = response.json()
+        for commit in response_json:
+            sha_list.append(commit['sha'])
+        url = response.links.get('next', {}).get('url')
     return sha_list
 
 
 def get_repo_commit_sha(username, repo_name, sha):
     """
-    This function will return commits details: author, message, date, file
+    This function will return commits details: author, message, date, first file and all files with their diff
     :param: username: repo owner
     :param: repo_name: repository name
     :param: sha: commit SHA
@@ -140,19 +498,98 @@ def get_repo_commit_sha(username, repo_name, sha):
     """
     url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/commits/' + sha
     header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
+    # the commits details are template metadata, lower priority than the files content
+    response = github_get(url, header, PRIORITY_LOW)
     response_json = response.json()
     commit_author = response_json['commit']['author']['email']
     commit_date = response_json['commit']['author']['date']
     commit_message = response_json['commit']['message']
-    commit_file = response_json['files'][0]['filename']
     commit_url = response_json['html_url']
-    commit_diff = response_json['files'][0]['patch']
+    commit_files = []
+    for file in response_json.get('files', []):
+        commit_files.append({'filename': file['filename'], 'diff': file.get('patch', '')})
+    commit_file = commit_files[0]['filename'] if commit_files else None
+    commit_diff = commit_files[0]['diff'] if commit_files else ''
     commit_info = {'filename': commit_file, 'date': commit_date, 'message': commit_message, 'url': commit_url,
-                   'author': commit_author, 'diff': commit_diff}
+                   'author': commit_author, 'diff': commit_diff, 'files': commit_files}
     return commit_info
 
 
+def load_commits_cache(cache_file):
+    """
+    This function will load the commits details from the JSON-lines cache file, once per run
+    :param cache_file: cache file path
+    :return: {commit SHA: commit details}
+    """
+    if cache_file in commits_caches:
+        return commits_caches[cache_file]
+    commits_cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # partially written line
+                commits_cache[entry['sha']] = entry['commit_info']
+    commits_caches[cache_file] = commits_cache
+    return commits_cache
+
+
+def get_repo_commits_info(username, repo_name, sha_list):
+    """
+    This function will return the commits details for a list of commits SHA.
+    Commits are immutable, the details are saved to a SHA keyed JSON-lines file in the cache folder, only the commits
+    not found in the cache are retrieved from GitHub, concurrently
+    :param username: repo owner
+    :param repo_name: repository name
+    :param sha_list: list of commits SHA
+    :return: list of commits details, same order as the SHA list
+    """
+    cache_file = os.path.join(GITHUB_CACHE_PATH, 'commits_v' + str(COMMITS_CACHE_VERSION) + '_' + username + '_' +
+                              repo_name + '.jsonl')
+    commits_cache = load_commits_cache(cache_file)
+
+    new_sha_list = [sha for sha in dict.fromkeys(sha_list) if sha not in commits_cache]
+    if new_sha_list:
+        with ThreadPoolExecutor(max_workers=GITHUB_WORKERS) as executor:
+            new_commits = executor.map(lambda sha: get_repo_commit_sha(username, repo_name, sha), new_sha_list)
+            os.makedirs(GITHUB_CACHE_PATH, exist_ok=True)
+            with open(cache_file, 'a') as f:
+                for sha, commit_info in zip(new_sha_list, new_commits):
+                    commits_cache[sha] = commit_info
+                    f.write(json.dumps({'sha': sha, 'commit_info': commit_info}) + '\n')
+
+    return [commits_cache[sha] for sha in sha_list]
+
+
+def get_files_last_commit(username, repo_name, files_list, sha_list):
+    """
+    This function will return the last commit for each file, using the files list of each commit.
+    The commits history is walked from the newest commit, in batches retrieved concurrently, and it stops as soon as
+    all files have been found
+    :param username: repo owner
+    :param repo_name: repository name
+    :param files_list: list of files paths
+    :param sha_list: list of commits SHA, newest commit first
+    :return: {file path: commit details}, files not found in the commits history are not included
+    """
+    files_commit = {}
+    pending_files = set(files_list)
+    for index in range(0, len(sha_list), GITHUB_WORKERS):
+        if not pending_files:
+            break
+        commits_info = get_repo_commits_info(username, repo_name, sha_list[index:index + GITHUB_WORKERS])
+        for commit_info in commits_info:
+            for file in commit_info['files']:
+                if file['filename'] in pending_files:
+                    pending_files.remove(file['filename'])
+                    file_commit = dict(commit_info, filename=file['filename'], diff=file['diff'])
+                    del file_commit['files']
+                    files_commit[file['filename']] = file_commit
+    return files_commit
+
+
 def github_push(github_repo, filename, message, content, update=False):
     """
     This function will create or update a file in a GitHub repo
@@ -177,3 +614,66 @@ def github_push(github_repo, filename, message, content, update=False):
     else:
         # create new file
         repo.create_file(filename, message, content, branch="main")
+
+
+def github_push_files(github_repo, files, message, branch='main'):
+    """
+    This function will create or update multiple files in a GitHub repo with a single commit, using the Git Data API:
+    a blob for each file, one tree, one commit and the branch reference update.
+    The branch is updated only after all the blobs and the tree were created, a failed run will not leave a partial
+    commit in the repo. Repos without commits are initialized with one commit for each file
+    :param github_repo: GitHub repo to be updated
+    :param files: {file path: file content}, None content to remove the file
+    :param message: commit message
+    :param branch: branch name
+    :return: new commit SHA, None if no files
+    """
+    if not files:
+        return None
+    repo_url = GITHUB_URL + '/repos/' + GITHUB_USERNAME + '/' + github_repo
+    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
+
+    # get the branch head commit and tree
+    response = github_get(repo_url + '/branches/' + branch, header)
+    if response.status_code == 404:
+        # the Git Data API is not available for empty repos
+        for filename, content in files.items():
+            if content is not None:
+                github_push(github_repo=github_repo, filename=filename, message=message, content=content,
+                            update=False)
+        return None
+    response.raise_for_status()
+    head_commit = response.json()['commit']
+    parent_sha = head_commit['sha']
+    base_tree_sha = head_commit['commit']['tree']['sha']
+
+    # upload the files content
+    tree = []
+    for filename, content in files.items():
+        if content is None:
+            # a tree entry without SHA removes the file
+            tree.append({'path': filename, 'mode': '100644', 'type': 'blob', 'sha': None})
+            continue
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        payload = {'content': base64.b64encode(content).decode(), 'encoding': 'base64'}
+        response = github_request('POST', repo_url + '/git/blobs', header, json=payload)
+        response.raise_for_status()
+        tree.append({'path': filename, 'mode': '100644', 'type': 'blob', 'sha': response.json()['sha']})
+
+    # create the tree and the commit
+    payload = {'base_tree': base_tree_sha, 'tree': tree}
+    response = github_request('POST', repo_url + '/git/trees', header, json=payload)
+    response.raise_for_status()
+    tree_sha = response.json()['sha']
+
+    payload = {'message': message, 'tree': tree_sha, 'parents': [parent_sha]}
+    response = github_request('POST', repo_url + '/git/commits', header, json=payload)
+    response.raise_for_status()
+    commit_sha = response.json()['sha']
+
+    # move the branch to the new commit
+    payload = {'sha': commit_sha, 'force': False}
+    response = github_request('PATCH', repo_url + '/git/refs/heads/' + branch, header, json=payload)
+    response.raise_for_status()
+    return commit_sha
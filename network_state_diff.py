@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import network_state_files
+
+load_dotenv('environment.env')
+
+# change journal file, one NDJSON line for each added, removed or modified record, empty to disable the journal
+CHANGE_JOURNAL = os.getenv('CHANGE_JOURNAL', 'change_journal.ndjson')
+if CHANGE_JOURNAL:
+    CHANGE_JOURNAL = os.path.abspath(CHANGE_JOURNAL)
+
+# stable key for the records in each network state file
+SNAPSHOT_KEYS = {
+    'site_hierarchy': 'site_id',
+    'device_inventory': 'device_id',
+    'ap_inventory': 'device_id',
+    'network_settings': 'site_name_hierarchy'
+}
+
+# the previous field values up to this JSON size are kept for the journal, the larger values are kept as a hash
+JOURNAL_VALUE_SIZE = 64
+
+
+def get_record_fields(record):
+    """
+    This function will return the fields of a record, the network settings are split in a field for each setting key
+    :param record: network state record
+    :return: {field name: value}
+    """
+    fields = {}
+    for name, value in record.items():
+        if name == 'network_settings' and isinstance(value, list):
+            for key, setting in network_state_files.get_settings_by_key(value).items():
+                fields['network_settings.' + key] = setting
+        else:
+            fields[name] = value
+    return fields
+
+
+def get_field_digest(value):
+    """
+    This function will return the digest of a field value: the JSON value for the small values, or "#" followed by
+    the value hash, the memory for the previous snapshot index is bounded by the number of fields
+    :param value: field value
+    :return: field digest
+    """
+    text = json.dumps(value, sort_keys=True)
+    if len(text) <= JOURNAL_VALUE_SIZE:
+        return text
+    return '#' + hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def get_digest_value(digest):
+    """
+    This function will return the field value from the field digest, if the value was kept
+    :param digest: field digest
+    :return: field value, None for the hashed values
+    """
+    if digest.startswith('#'):
+        return None
+    return json.loads(digest)
+
+
+def index_records(records, key):
+    """
+    This function will index the records by key, with the digest of each field
+    :param records: iterable of records
+    :param key: record key field, example "device_id"
+    :return: {record key: {field name: field digest}}
+    """
+    index = {}
+    for record in records:
+        index[record.get(key)] = {name: get_field_digest(value) for name, value in get_record_fields(record).items()}
+    return index
+
+
+def diff_records(previous_index, records, key):
+    """
+    This function will compare the records with the previous records index, in linear time.
+    The previous records index is consumed, the records not found in the new records are removed records
+    :param previous_index: {record key: {field name: field digest}}, as returned by index_records
+    :param records: iterable of the new records
+    :param key: record key field, example "device_id"
+    :return: generator of changes, {'change': 'added', 'key', 'record'}, {'change': 'removed', 'key', 'fields'},
+    {'change': 'modified', 'key', 'added_fields', 'removed_fields', 'modified_fields'}
+    """
+    for record in records:
+        record_key = record.get(key)
+        previous_fields = previous_index.pop(record_key, None)
+        if previous_fields is None:
+            yield {'change': 'added', 'key': record_key, 'record': record}
+            continue
+        fields = get_record_fields(record)
+        added_fields = {}
+        modified_fields = {}
+        for name, value in fields.items():
+            previous_digest = previous_fields.pop(name, None)
+            if previous_digest is None:
+                added_fields[name] = value
+            elif previous_digest != get_field_digest(value):
+                modified_fields[name] = {'old': get_digest_value(previous_digest), 'new': value}
+        removed_fields = {name: get_digest_value(digest) for name, digest in previous_fields.items()}
+        if added_fields or removed_fields or modified_fields:
+            yield {'change': 'modified', 'key': record_key, 'added_fields': added_fields,
+                   'removed_fields': removed_fields, 'modified_fields': modified_fields}
+    for record_key, previous_fields in previous_index.items():
+        yield {'change': 'removed', 'key': record_key,
+               'fields': {name: get_digest_value(digest) for name, digest in previous_fields.items()}}
+
+
+def index_snapshot(state_path):
+    """
+    This function will index the previous network state files, sharded or monolithic, it must be called before the
+    files are saved
+    :param state_path: network state files folder
+    :return: {file name: records index}, only the files found
+    """
+    snapshot = {}
+    for name, key in SNAPSHOT_KEYS.items():
+        if network_state_files.has_state_records(state_path, name):
+            snapshot[network_state_files.get_file_name(name)] = index_records(
+                network_state_files.read_state_records(state_path, name), key)
+    return snapshot
+
+
+def diff_snapshot(state_path, previous_snapshot, journal_file=CHANGE_JOURNAL, prefix=''):
+    """
+    This function will compare the network state files with the previous snapshot, and append the changes to the
+    change journal. Each journal line is a single append write, the journal may be shared by parallel processes
+    :param state_path: network state files folder
+    :param previous_snapshot: {file name: records index}, as returned by index_snapshot
+    :param journal_file: change journal file, None to only count the changes
+    :param prefix: prefix for the file names in the journal, example the controller folder
+    :return: {file name: {'added', 'removed', 'modified'}}, only the files with a previous snapshot
+    """
+    summary = {}
+    date_time = str(datetime.now().replace(microsecond=0))
+    journal = os.open(journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644) if journal_file else None
+    try:
+        for name, key in SNAPSHOT_KEYS.items():
+            file_name = network_state_files.get_file_name(name)
+            if file_name not in previous_snapshot or not network_state_files.has_state_records(state_path, name):
+                continue
+            counts = {'added': 0, 'removed': 0, 'modified': 0}
+            for change in diff_records(previous_snapshot[file_name],
+                                       network_state_files.read_state_records(state_path, name), key):
+                counts[change['change']] += 1
+                if journal is not None:
+                    entry = dict({'time': date_time, 'file': prefix + file_name}, **change)
+                    os.write(journal, (json.dumps(entry) + '\n').encode())
+            summary[file_name] = counts
+    finally:
+        if journal is not None:
+            os.close(journal)
+    return summary
@@ -0,0 +1,604 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import hashlib
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv('environment.env')
+
+# network state files format: "json" - one pretty JSON list per file, "ndjson" - one JSON record per line
+NETWORK_STATE_FORMAT = os.getenv('NETWORK_STATE_FORMAT', 'json')
+
+# optional site-sharded layout for the device inventories and the network settings, one file for each building or area
+NETWORK_STATE_SHARDED = os.getenv('NETWORK_STATE_SHARDED', 'False').lower() == 'true'
+# site hierarchy levels for the shards, 3 for "Global/Area/Building"
+NETWORK_STATE_SHARD_DEPTH = int(os.getenv('NETWORK_STATE_SHARD_DEPTH', 3))
+
+# network state files that may be sharded, the shards are saved to a folder with the same name
+SHARDED_FILES = ('device_inventory', 'ap_inventory', 'network_settings')
+# network state files, saved by each run
+STATE_FILES = ('site_hierarchy', 'device_inventory', 'ap_inventory', 'network_settings')
+# manifest for the sharded files: shards paths, records count and content hashes
+MANIFEST_FILE = 'manifest.json'
+# shard for the records without a site
+UNASSIGNED_SHARD = 'Unassigned'
+# shard file path in the sharded file folder, the site hierarchy starts with the Global site
+SHARD_PATH_PATTERN = re.compile(r'(Global(/[^./][^/]*)*|' + UNASSIGNED_SHARD + r')\.(json|ndjson)')
+# characters kept in memory by the sharded records writer, the records are then appended to the shards files
+SHARD_BUFFER_SIZE = 8 * 1024 * 1024
+# characters read at a time from the "json" format files
+READ_CHUNK_SIZE = 65536
+# whitespace between the JSON values
+WHITESPACE_PATTERN = re.compile(r'\s*')
+
+
+def get_file_name(name, file_format=None):
+    """
+    This function will return the network state file name for the format
+    :param name: file name without extension, example "device_inventory"
+    :param file_format: "json" or "ndjson", default NETWORK_STATE_FORMAT
+    :return: file name
+    """
+    return name + '.' + (file_format or NETWORK_STATE_FORMAT)
+
+
+class RecordWriter:
+    """
+    This class will write records to a network state file, one record at a time, the records are not kept in memory.
+    The "json" format output is identical to json.dumps(records, indent=4).
+    The records are written to a temporary file, the file is replaced only if all the records were written
+    """
+
+    def __init__(self, file_path, file_format=None):
+        """
+        :param file_path: file path
+        :param file_format: "json" or "ndjson", default NETWORK_STATE_FORMAT
+        """
+        self.file_path = file_path
+        self.file_format = file_format or NETWORK_STATE_FORMAT
+        self.count = 0
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.file_path + '.tmp', 'w')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.save()
+        else:
+            # keep the previous file, a partial file would be a valid file with missing records
+            self.file.close()
+            os.remove(self.file_path + '.tmp')
+
+    def save(self):
+        """
+        This method will complete the file and replace the previous file, the file with the other format is removed
+        :return:
+        """
+        if self.file_format == 'json':
+            self.file.write('\n]' if self.count else '[]')
+        self.file.close()
+        os.replace(self.file_path + '.tmp', self.file_path)
+        file_name, file_format = os.path.splitext(self.file_path)
+        for other_format in ('json', 'ndjson'):
+            if '.' + other_format != file_format and os.path.exists(file_name + '.' + other_format):
+                os.remove(file_name + '.' + other_format)
+
+    def write(self, record):
+        """
+        This method will append a record to the file
+        :param record: record to save
+        :return:
+        """
+        if self.file_format == 'ndjson':
+            self.file.write(json.dumps(record) + '\n')
+        else:
+            self.file.write(',\n    ' if self.count else '[\n    ')
+            self.file.write(json.dumps(record, indent=4).replace('\n', '\n    '))
+        self.count += 1
+
+
+def serialize_record(record, file_format):
+    """
+    This function will serialize a record for the file format, same as the RecordWriter, without the separator
+    :param record: record to save
+    :param file_format: "json" or "ndjson"
+    :return: serialized record
+    """
+    if file_format == 'ndjson':
+        return json.dumps(record) + '\n'
+    return json.dumps(record, indent=4).replace('\n', '\n    ')
+
+
+def get_shard(site_name_hierarchy, depth=None):
+    """
+    This function will return the shard for a site, the site hierarchy up to the shard depth
+    :param site_name_hierarchy: site name hierarchy, example "Global/San Jose/Building 1/Floor 2"
+    :param depth: site hierarchy levels, default NETWORK_STATE_SHARD_DEPTH
+    :return: shard, example "Global/San Jose/Building 1"
+    """
+    if not site_name_hierarchy:
+        return UNASSIGNED_SHARD
+    return '/'.join(site_name_hierarchy.split('/')[:depth or NETWORK_STATE_SHARD_DEPTH])
+
+
+def get_shard_path(name, shard, file_format):
+    """
+    This function will return the shard file path, relative to the network state folder
+    :param name: file name without extension, example "device_inventory"
+    :param shard: shard, example "Global/San Jose/Building 1"
+    :param file_format: "json" or "ndjson"
+    :return: shard file path, example "device_inventory/Global/San Jose/Building 1.json"
+    """
+    # the site names may not start with a dot, no hidden or parent folders
+    parts = [re.sub(r'^\.', '_', part) or '_' for part in shard.split('/')]
+    return name + '/' + '/'.join(parts) + '.' + file_format
+
+
+def read_manifest(state_path):
+    """
+    This function will read the sharded files manifest
+    :param state_path: network state files folder
+    :return: manifest, {'files': {name: {'format', 'count', 'shards'}}}
+    """
+    try:
+        with open(state_path + MANIFEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+
+def save_manifest(state_path, manifest):
+    """
+    This function will save the sharded files manifest, the manifest is removed if there are no sharded files
+    :param state_path: network state files folder
+    :param manifest: manifest
+    :return:
+    """
+    if not manifest['files']:
+        if os.path.exists(state_path + MANIFEST_FILE):
+            os.remove(state_path + MANIFEST_FILE)
+        return
+    with open(state_path + MANIFEST_FILE, 'w') as f:
+        f.write(json.dumps(manifest, indent=4))
+
+
+class ShardedRecordWriter:
+    """
+    This class will write records to the site shards of a network state file, one file for each building or area.
+    The records are appended to a temporary file for each shard, with a bounded buffer for all the shards, and hashed
+    while written. When the writer is closed, only the shards with a different content are replaced.
+    The manifest keeps the records count and the hash of each shard, the shards are sorted by site. The reassembled
+    records are in the shards order, a record added or removed changes only the manifest entry of its shard
+    """
+
+    def __init__(self, state_path, name, site_field, file_format=None):
+        """
+        :param state_path: network state files folder
+        :param name: file name without extension, example "device_inventory"
+        :param site_field: record field with the site name hierarchy, example "site"
+        :param file_format: "json" or "ndjson", default NETWORK_STATE_FORMAT
+        """
+        self.state_path = state_path
+        self.name = name
+        self.site_field = site_field
+        self.file_format = file_format or NETWORK_STATE_FORMAT
+        # {shard: {'count': number of records, 'sha256': content hash object, 'buffer': records not yet written,
+        # 'created': True if the temporary file was created}}
+        self.shards = {}
+        self.buffer_size = 0
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.save()
+        else:
+            # keep the previous shards, a partial shard would be a valid file with missing records
+            for shard in self.shards:
+                remove_file(self.state_path, self.get_temp_path(shard))
+
+    def get_temp_path(self, shard):
+        """
+        This method will return the shard temporary file path, relative to the network state folder
+        :param shard: shard, example "Global/San Jose/Building 1"
+        :return: temporary file path
+        """
+        return get_shard_path(self.name, shard, self.file_format) + '.tmp'
+
+    def flush(self):
+        """
+        This method will append the buffered records to the shards temporary files
+        :return:
+        """
+        for shard, shard_info in self.shards.items():
+            if not shard_info['buffer']:
+                continue
+            temp_path = self.state_path + self.get_temp_path(shard)
+            if not shard_info['created']:
+                os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+            with open(temp_path, 'a' if shard_info['created'] else 'w') as f:
+                f.write(''.join(shard_info['buffer']))
+            shard_info['buffer'] = []
+            shard_info['created'] = True
+        self.buffer_size = 0
+
+    def write(self, record):
+        """
+        This method will append a record to the site shard, the buffer is written when full
+        :param record: record to save
+        :return:
+        """
+        shard = get_shard(record.get(self.site_field))
+        shard_info = self.shards.setdefault(shard, {'count': 0, 'sha256': hashlib.sha256(), 'buffer': [],
+                                                    'created': False})
+        content = serialize_record(record, self.file_format)
+        if self.file_format == 'json':
+            content = (',\n    ' if shard_info['count'] else '[\n    ') + content
+        shard_info['buffer'].append(content)
+        shard_info['sha256'].update(content.encode())
+        shard_info['count'] += 1
+        self.count += 1
+        self.buffer_size += len(content)
+        if self.buffer_size >= SHARD_BUFFER_SIZE:
+            self.flush()
+
+    def save(self):
+        """
+        This method will replace the changed shards, save the manifest, and remove the shards with no records
+        :return:
+        """
+        if self.file_format == 'json':
+            for shard_info in self.shards.values():
+                shard_info['buffer'].append('\n]')
+                shard_info['sha256'].update(b'\n]')
+        self.flush()
+        manifest = read_manifest(self.state_path)
+        previous_shards = manifest['files'].get(self.name, {}).get('shards', {})
+        shards = {}
+        for shard in sorted(self.shards):
+            shard_info = self.shards[shard]
+            temp_path = self.state_path + self.get_temp_path(shard)
+            shard_path = get_shard_path(self.name, shard, self.file_format)
+            content_hash = shard_info['sha256'].hexdigest()
+            previous_shard = previous_shards.get(shard, {})
+            if (previous_shard.get('sha256') != content_hash or previous_shard.get('path') != shard_path or
+                    not os.path.exists(self.state_path + shard_path)):
+                os.replace(temp_path, self.state_path + shard_path)
+            else:
+                os.remove(temp_path)
+            shards[shard] = {'path': shard_path, 'count': shard_info['count'], 'sha256': content_hash}
+        for shard, previous_shard in previous_shards.items():
+            if shards.get(shard, {}).get('path') != previous_shard['path']:
+                remove_file(self.state_path, previous_shard['path'])
+        manifest['files'][self.name] = {'format': self.file_format, 'count': self.count, 'shards': shards}
+        save_manifest(self.state_path, manifest)
+
+        # the shards replace the monolithic file
+        for file_format in ('json', 'ndjson'):
+            remove_file(self.state_path, get_file_name(self.name, file_format))
+
+
+def remove_file(state_path, file_path):
+    """
+    This function will remove a network state file, and the shard folders left empty
+    :param state_path: network state files folder
+    :param file_path: file path, relative to the network state folder
+    :return:
+    """
+    if os.path.exists(state_path + file_path):
+        os.remove(state_path + file_path)
+    folder = os.path.dirname(file_path)
+    while folder and os.path.isdir(state_path + folder) and not os.listdir(state_path + folder):
+        os.rmdir(state_path + folder)
+        folder = os.path.dirname(folder)
+
+
+def remove_shards(state_path, name):
+    """
+    This function will remove the shards of a network state file, and the file from the manifest
+    :param state_path: network state files folder
+    :param name: file name without extension, example "device_inventory"
+    :return:
+    """
+    manifest = read_manifest(state_path)
+    if name not in manifest['files']:
+        return
+    for shard in manifest['files'][name]['shards'].values():
+        remove_file(state_path, shard['path'])
+    del manifest['files'][name]
+    save_manifest(state_path, manifest)
+
+
+class MonolithicRecordWriter(RecordWriter):
+    """
+    This class will write records to the monolithic network state file, the file replaces the shards
+    """
+
+    def __init__(self, state_path, name, file_format=None):
+        """
+        :param state_path: network state files folder
+        :param name: file name without extension, example "device_inventory"
+        :param file_format: "json" or "ndjson", default NETWORK_STATE_FORMAT
+        """
+        super().__init__(state_path + get_file_name(name, file_format), file_format)
+        self.state_path = state_path
+        self.name = name
+
+    def save(self):
+        """
+        This method will save the file, and remove the shards and the manifest entry of the sharded layout
+        :return:
+        """
+        super().save()
+        remove_shards(self.state_path, self.name)
+
+
+def get_record_writer(state_path, name, site_field):
+    """
+    This function will return the records writer for a network state file: a ShardedRecordWriter if
+    NETWORK_STATE_SHARDED, or a RecordWriter for the monolithic file
+    :param state_path: network state files folder
+    :param name: file name without extension, example "device_inventory"
+    :param site_field: record field with the site name hierarchy, used for the shards
+    :return: records writer
+    """
+    if NETWORK_STATE_SHARDED:
+        return ShardedRecordWriter(state_path, name, site_field)
+    return MonolithicRecordWriter(state_path, name)
+
+
+def write_records(file_path, records, file_format=None):
+    """
+    This function will write all the records from an iterable to a network state file
+    :param file_path: file path
+    :param records: iterable of records, may be a generator
+    :param file_format: "json" or "ndjson", default NETWORK_STATE_FORMAT
+    :return: number of records saved
+    """
+    with RecordWriter(file_path, file_format) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def read_records(file_path):
+    """
+    This function will read the records from a network state file, one record at a time for both formats
+    :param file_path: file path, ".ndjson" or ".json"
+    :return: generator of records
+    """
+    with open(file_path) as f:
+        if file_path.endswith('.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from read_json_records(f)
+
+
+def read_json_records(f):
+    """
+    This function will read the records from a JSON list file, one record at a time, only the current chunk of the
+    file is kept in memory, not the whole list
+    :param f: file object
+    :return: generator of records
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    end_of_file = False
+    state = 'start'
+    while state != 'end':
+        position = WHITESPACE_PATTERN.match(buffer, position).end()
+        record = end = None
+        if position < len(buffer) and state in ('first', 'record') and buffer[position] != ']':
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+        # a record at the end of the buffer may be partial, example a number, the next chunk is needed
+        if not end_of_file and (position == len(buffer) or end == len(buffer) or
+                                (end is None and state in ('first', 'record') and buffer[position] != ']')):
+            # the chunk size at least doubles for the records larger than a chunk, linear time for any record size
+            chunk = f.read(max(READ_CHUNK_SIZE, len(buffer) - position))
+            end_of_file = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if position == len(buffer):
+            raise ValueError('Incomplete JSON list in the file ' + f.name)
+        if end is not None:
+            yield record
+            position = end
+            state = 'next'
+            continue
+        character = buffer[position]
+        position += 1
+        if state == 'start' and character == '[':
+            state = 'first'
+        elif state in ('first', 'next') and character == ']':
+            state = 'end'
+        elif state == 'next' and character == ',':
+            state = 'record'
+        else:
+            raise ValueError('Unexpected "' + character + '" in the JSON list file ' + f.name)
+
+
+def read_sharded_records(state_path, name):
+    """
+    This function will reassemble the records of a sharded network state file, one shard at a time, in the manifest
+    shards order, sorted by site. The records of each shard are in the monolithic file order
+    :param state_path: network state files folder
+    :param name: file name without extension, example "device_inventory"
+    :return: generator of records
+    """
+    for shard in read_manifest(state_path)['files'][name]['shards'].values():
+        yield from read_records(state_path + shard['path'])
+
+
+def has_state_records(state_path, name):
+    """
+    This function will verify if a network state file exists, sharded or monolithic
+    :param state_path: network state files folder
+    :param name: file name without extension, example "device_inventory"
+    :return: True if the file exists
+    """
+    return name in read_manifest(state_path)['files'] or os.path.exists(state_path + get_file_name(name))
+
+
+def read_state_records(state_path, name):
+    """
+    This function will read the records of a network state file, sharded or monolithic
+    :param state_path: network state files folder
+    :param name: file name without extension, example "device_inventory"
+    :return: generator of records
+    """
+    if name in read_manifest(state_path)['files']:
+        return read_sharded_records(state_path, name)
+    return read_records(state_path + get_file_name(name))
+
+
+def is_layout_file(file_path, prefixes=('',)):
+    """
+    This function will verify if a file is a network state file that may be replaced by a layout or format change,
+    only the paths saved by the network state sync: the network state files in both formats, the shards in the
+    sharded files folders, and the manifest
+    :param file_path: file path, relative to the network state folder
+    :param prefixes: network state files folders, relative to the network state folder, example the controllers
+    folders "dc1/", default the network state folder
+    :return: True for the layout files
+    """
+    for prefix in prefixes:
+        if not file_path.startswith(prefix):
+            continue
+        path = file_path[len(prefix):]
+        if path == MANIFEST_FILE:
+            return True
+        folder, separator, shard_path = path.partition('/')
+        if not separator:
+            name, extension = os.path.splitext(path)
+            if name in STATE_FILES and extension in ('.json', '.ndjson'):
+                return True
+        elif folder in SHARDED_FILES and SHARD_PATH_PATTERN.fullmatch(shard_path):
+            return True
+    return False
+
+
+def get_parent_site(site_name_hierarchy):
+    """
+    This function will return the parent site name hierarchy
+    :param site_name_hierarchy: site name hierarchy, example "Global/San Jose/Building 1"
+    :return: parent site name hierarchy, None for the Global site
+    """
+    if '/' not in site_name_hierarchy:
+        return None
+    return site_name_hierarchy.rsplit('/', 1)[0]
+
+
+def get_settings_by_key(network_settings):
+    """
+    This function will index a site network settings by the setting key
+    :param network_settings: list of settings, as returned by the network settings API
+    :return: {setting key: setting}
+    """
+    return {setting.get('key', json.dumps(setting, sort_keys=True)): setting for setting in network_settings}
+
+
+def get_inherited_setting(parent_setting, group_uuid):
+    """
+    This function will return a parent site setting as inherited by a child site, the setting group is the child site
+    :param parent_setting: parent site setting
+    :param group_uuid: child site group id, the "groupUuid" of the child site settings
+    :return: child site setting
+    """
+    setting = dict(parent_setting)
+    if 'groupUuid' in setting:
+        setting['groupUuid'] = group_uuid
+    return setting
+
+
+def compact_network_settings(sites_settings, parent_sites=None):
+    """
+    This function will convert the full network settings of each site to the settings different from the parent site:
+    the settings not identical to the inherited parent setting, and the keys of the parent settings not defined for
+    the site. The site group id and, if different from the inherited order, the settings order are kept, the full
+    settings are rebuilt unchanged by expand_network_settings.
+    The parent site records must be before the child site records, as in a list sorted by site name hierarchy
+    :param sites_settings: iterable of {'site_name_hierarchy', 'network_settings'}, full settings
+    :param parent_sites: set of the sites with child sites, only these full settings are kept in memory, default all
+    :return: generator of {'site_name_hierarchy', 'parent', 'group_uuid', 'network_settings', 'removed_settings'},
+    and 'settings_order' if needed
+    """
+    parents_settings = {}
+    for site_settings in sites_settings:
+        site_name_hierarchy = site_settings['site_name_hierarchy']
+        parent = get_parent_site(site_name_hierarchy)
+        settings = get_settings_by_key(site_settings['network_settings'])
+        group_uuid = next((setting['groupUuid'] for setting in settings.values() if setting.get('groupUuid')), None)
+        parent_settings = parents_settings.get(parent, {})
+        if parent_sites is None or site_name_hierarchy in parent_sites:
+            parents_settings[site_name_hierarchy] = settings
+        changed_settings = [setting for key, setting in settings.items() if key not in parent_settings or
+                            get_inherited_setting(parent_settings[key], group_uuid) != setting]
+        removed_settings = [key for key in parent_settings if key not in settings]
+        compact_settings = {'site_name_hierarchy': site_name_hierarchy, 'parent': parent, 'group_uuid': group_uuid,
+                            'network_settings': changed_settings, 'removed_settings': removed_settings}
+        # the expanded settings are in the parent settings order, followed by the site settings
+        inherited_order = ([key for key in parent_settings if key in settings] +
+                           [key for key in settings if key not in parent_settings])
+        if list(settings) != inherited_order:
+            compact_settings['settings_order'] = list(settings)
+        yield compact_settings
+
+
+def expand_network_settings(sites_settings):
+    """
+    This function will rebuild the full network settings of each site from the compact network settings.
+    The inherited settings are the parent site settings, the records with full settings are returned unchanged
+    :param sites_settings: iterable of compact network settings, as returned by compact_network_settings, sorted by
+    site name hierarchy
+    :return: generator of {'site_name_hierarchy', 'network_settings'}, full settings
+    """
+    full_settings = {}
+    for site_settings in sites_settings:
+        if 'parent' not in site_settings:
+            yield site_settings
+            continue
+        group_uuid = site_settings.get('group_uuid')
+        settings = {key: get_inherited_setting(setting, group_uuid)
+                    for key, setting in full_settings.get(site_settings['parent'], {}).items()}
+        for key in site_settings['removed_settings']:
+            settings.pop(key, None)
+        settings.update(get_settings_by_key(site_settings['network_settings']))
+        if 'settings_order' in site_settings:
+            settings = {key: settings[key] for key in site_settings['settings_order']}
+        full_settings[site_settings['site_name_hierarchy']] = settings
+        yield {'site_name_hierarchy': site_settings['site_name_hierarchy'], 'network_settings': list(settings.values())}
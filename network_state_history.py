@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import network_state_diff
+import network_state_files
+
+load_dotenv('environment.env')
+
+# local snapshot history folder, each network state sync run is added to the history, empty to disable the history
+NETWORK_STATE_HISTORY_PATH = os.getenv('NETWORK_STATE_HISTORY_PATH', '.network_state_history/')
+if NETWORK_STATE_HISTORY_PATH:
+    NETWORK_STATE_HISTORY_PATH = os.path.abspath(NETWORK_STATE_HISTORY_PATH)
+
+# network state files with device records, indexed by hostname
+DEVICE_FILES = ('device_inventory', 'ap_inventory')
+
+os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST, same as the network state sync app
+time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
+
+
+def get_bucket(record_key):
+    """
+    This function will return the bucket for a record key, the records of a snapshot file are split in 256 buckets,
+    a changed record will add a new bucket, not a new list of all the records
+    :param record_key: record key, example the device id
+    :return: bucket, two hex digits
+    """
+    return hashlib.sha256(record_key.encode()).hexdigest()[:2]
+
+
+def get_epoch(date_time):
+    """
+    This function will convert a date and time to epoch
+    :param date_time: local date and time, example "2023-12-06" or "2023-12-06 16:24:31", None for now
+    :return: epoch seconds
+    """
+    if not date_time:
+        return time.time()
+    return datetime.fromisoformat(date_time).timestamp()
+
+
+def append_lines(file_path, items):
+    """
+    This function will append JSON lines to a file, each line is a single append write, the file may be shared
+    by parallel processes
+    :param file_path: file path
+    :param items: iterable of items to save
+    :return:
+    """
+    file = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        for item in items:
+            os.write(file, (json.dumps(item) + '\n').encode())
+    finally:
+        os.close(file)
+
+
+def read_lines(file_path):
+    """
+    This function will read the JSON lines from a file
+    :param file_path: file path
+    :return: list of items, empty list if the file does not exist
+    """
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class SnapshotStore:
+    """
+    This class will keep the network state snapshots in a content-addressed store: each distinct record, records
+    bucket and snapshot file tree is saved once, as an object named by the content hash. A snapshot is one line in
+    the snapshots index, and the storage grows with the changed records, not the number of snapshots.
+    The file tree keeps the records order, the records of a snapshot file are returned as saved in the file.
+    The device hostnames are indexed with the device ids, for the queries by hostname
+    """
+
+    def __init__(self, history_path=NETWORK_STATE_HISTORY_PATH):
+        """
+        :param history_path: snapshot history folder
+        """
+        self.history_path = history_path
+        self.snapshots_file = os.path.join(history_path, 'snapshots.ndjson')
+        self.hostnames_file = os.path.join(history_path, 'hostnames.ndjson')
+        self.new_objects = 0
+
+    def put_object(self, data):
+        """
+        This method will save an object, if not already saved. The object hash is the hash of the sorted keys JSON,
+        the object is saved with the data keys order
+        :param data: JSON serializable data
+        :return: object hash
+        """
+        object_hash = hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+        object_file = os.path.join(self.history_path, 'objects', object_hash[:2], object_hash[2:])
+        if not os.path.exists(object_file):
+            os.makedirs(os.path.dirname(object_file), exist_ok=True)
+            temp_file = object_file + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+            with open(temp_file, 'w') as f:
+                f.write(json.dumps(data, separators=(',', ':')))
+            os.replace(temp_file, object_file)
+            self.new_objects += 1
+        return object_hash
+
+    def get_object(self, object_hash):
+        """
+        This method will return an object
+        :param object_hash: object hash
+        :return: object data
+        """
+        with open(os.path.join(self.history_path, 'objects', object_hash[:2], object_hash[2:])) as f:
+            return json.load(f)
+
+    def add_snapshot(self, state_path, controller=None):
+        """
+        This method will add the network state files to the history, as a new snapshot
+        :param state_path: network state files folder
+        :param controller: controller name, None for the single controller mode
+        :return: snapshot
+        """
+        self.new_objects = 0
+        os.makedirs(self.history_path, exist_ok=True)
+        files = {}
+        hostnames = set()
+        for name, key in network_state_diff.SNAPSHOT_KEYS.items():
+            if not network_state_files.has_state_records(state_path, name):
+                continue
+            buckets = {}
+            order = []
+            for record in network_state_files.read_state_records(state_path, name):
+                record_key = str(record.get(key))
+                buckets.setdefault(get_bucket(record_key), {})[record_key] = self.put_object(record)
+                order.append(record_key)
+                if name in DEVICE_FILES:
+                    hostnames.add((record.get('hostname'), record_key))
+            tree = {'buckets': {bucket: self.put_object(records) for bucket, records in sorted(buckets.items())},
+                    'order': self.put_object(order)}
+            files[name] = self.put_object(tree)
+
+        # one second resolution, same as the snapshot time used for the queries
+        now = int(time.time())
+        snapshot = {'time': str(datetime.fromtimestamp(now)), 'epoch': now,
+                    'controller': controller, 'files': files}
+        append_lines(self.snapshots_file, [snapshot])
+
+        # index the new hostname and device id pairs
+        for item in read_lines(self.hostnames_file):
+            if item['controller'] == controller:
+                hostnames.discard((item['hostname'], item['device_id']))
+        append_lines(self.hostnames_file, [{'hostname': hostname, 'device_id': device_id, 'controller': controller,
+                                            'time': snapshot['time'], 'epoch': now}
+                                           for hostname, device_id in sorted(hostnames, key=str)])
+        return snapshot
+
+    def get_snapshots(self, controller=None, all_controllers=False):
+        """
+        This method will return the snapshots, in time order
+        :param controller: controller name, None for the single controller mode
+        :param all_controllers: True for the snapshots of all the controllers
+        :return: list of snapshots
+        """
+        return [snapshot for snapshot in read_lines(self.snapshots_file)
+                if all_controllers or snapshot['controller'] == controller]
+
+    def get_snapshot(self, epoch, controller=None):
+        """
+        This method will return the snapshot as of a time, the last snapshot before the time
+        :param epoch: time, epoch seconds
+        :param controller: controller name, None for the single controller mode
+        :return: snapshot, None if no snapshot before the time
+        """
+        snapshot_at = None
+        for snapshot in self.get_snapshots(controller):
+            if snapshot['epoch'] <= epoch:
+                snapshot_at = snapshot
+        return snapshot_at
+
+    def get_record(self, snapshot, name, record_key):
+        """
+        This method will return a record from a snapshot
+        :param snapshot: snapshot
+        :param name: file name without extension, example "device_inventory"
+        :param record_key: record key, example the device id
+        :return: record, None if not found
+        """
+        record_hash = self.get_record_hash(snapshot, name, record_key)
+        return self.get_object(record_hash) if record_hash else None
+
+    def get_record_hash(self, snapshot, name, record_key):
+        """
+        This method will return the object hash of a record from a snapshot
+        :param snapshot: snapshot
+        :param name: file name without extension, example "device_inventory"
+        :param record_key: record key, example the device id
+        :return: record object hash, None if not found
+        """
+        if name not in snapshot['files']:
+            return None
+        bucket_hash = self.get_object(snapshot['files'][name])['buckets'].get(get_bucket(record_key))
+        if bucket_hash is None:
+            return None
+        return self.get_object(bucket_hash).get(record_key)
+
+    def get_records(self, snapshot, name):
+        """
+        This method will return all the records of a snapshot file, in the file records order
+        :param snapshot: snapshot
+        :param name: file name without extension, example "device_inventory"
+        :return: generator of records
+        """
+        if name not in snapshot['files']:
+            return
+        tree = self.get_object(snapshot['files'][name])
+        records = {}
+        for bucket_hash in tree['buckets'].values():
+            records.update(self.get_object(bucket_hash))
+        for record_key in self.get_object(tree['order']):
+            yield self.get_object(records[record_key])
+
+    def get_device_ids(self, device, epoch, controller=None):
+        """
+        This method will return the device ids for a hostname as of a time, the device may be a device id
+        :param device: device hostname or id
+        :param epoch: time, epoch seconds
+        :param controller: controller name, None for the single controller mode
+        :return: list of device ids
+        """
+        device_ids = {}
+        for item in read_lines(self.hostnames_file):
+            if item['hostname'] == device and item['controller'] == controller and item['epoch'] <= epoch:
+                device_ids[item['device_id']] = item['epoch']
+        return sorted(device_ids, key=device_ids.get, reverse=True) or [device]
+
+    def get_device(self, device, epoch, controller=None):
+        """
+        This method will return a device record as of a time
+        :param device: device hostname or id
+        :param epoch: time, epoch seconds
+        :param controller: controller name, None for the single controller mode
+        :return: snapshot, device record; None, None if not found
+        """
+        snapshot = self.get_snapshot(epoch, controller)
+        if snapshot is None:
+            return None, None
+        for device_id in self.get_device_ids(device, epoch, controller):
+            for name in DEVICE_FILES:
+                record = self.get_record(snapshot, name, device_id)
+                if record is not None and (record.get('hostname') == device or device_id == device):
+                    return snapshot, record
+        return snapshot, None
+
+    def get_device_history(self, device, controller=None):
+        """
+        This method will return the device record changes, one item for each snapshot with a different record
+        :param device: device hostname or id
+        :param controller: controller name, None for the single controller mode
+        :return: list of {'time', 'record'}, record None if the device was not in the snapshot
+        """
+        device_ids = self.get_device_ids(device, time.time(), controller)
+        history = []
+        previous_hash = None
+        for snapshot in self.get_snapshots(controller):
+            record_hash = None
+            for device_id in device_ids:
+                for name in DEVICE_FILES:
+                    record_hash = record_hash or self.get_record_hash(snapshot, name, device_id)
+            if record_hash != previous_hash:
+                history.append({'time': snapshot['time'],
+                                'record': self.get_object(record_hash) if record_hash else None})
+                previous_hash = record_hash
+        return history
+
+
+def main():
+    """
+    This app will query the local network state snapshot history, saved by each network state sync run:
+     - snapshots: list the snapshots
+     - device: a device record as of a time, by hostname or device id
+     - history: the changes of a device record
+     - snapshot: all the records of a network state file as of a time, optional the full network settings
+    The times are local times, example "2023-12-06" or "2023-12-06 16:24:31", default now.
+    """
+    parser = argparse.ArgumentParser(description='Network state snapshot history queries')
+    parser.add_argument('--controller', help='controller name, for the multi-controller mode')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('snapshots', help='list the snapshots')
+    device_parser = subparsers.add_parser('device', help='device record as of a time')
+    device_parser.add_argument('device', help='device hostname or id')
+    device_parser.add_argument('--time', help='local time, default now')
+    history_parser = subparsers.add_parser('history', help='device record changes')
+    history_parser.add_argument('device', help='device hostname or id')
+    snapshot_parser = subparsers.add_parser('snapshot', help='network state file as of a time')
+    snapshot_parser.add_argument('--time', help='local time, default now')
+    snapshot_parser.add_argument('--file', default='device_inventory', choices=sorted(network_state_diff.SNAPSHOT_KEYS),
+                                 help='network state file, default device_inventory')
+    snapshot_parser.add_argument('--expand', action='store_true',
+                                 help='full network settings for each site, instead of the settings different from '
+                                      'the parent site')
+    args = parser.parse_args()
+
+    store = SnapshotStore()
+    if args.command == 'snapshots':
+        for snapshot in store.get_snapshots(all_controllers=True):
+            print(snapshot['time'] + (' ' + snapshot['controller'] if snapshot['controller'] else ''))
+    elif args.command == 'device':
+        snapshot, record = store.get_device(args.device, get_epoch(args.time), args.controller)
+        if record is None:
+            print('Device "' + args.device + '" not found')
+            sys.exit(1)
+        print(json.dumps({'snapshot': snapshot['time'], 'record': record}, indent=4))
+    elif args.command == 'history':
+        print(json.dumps(store.get_device_history(args.device, args.controller), indent=4))
+    else:
+        snapshot = store.get_snapshot(get_epoch(args.time), args.controller)
+        if snapshot is None:
+            print('No snapshot found')
+            sys.exit(1)
+        records = store.get_records(snapshot, args.file)
+        if args.expand and args.file == 'network_settings':
+            # the records are in the file order, the parent sites first
+            records = network_state_files.expand_network_settings(records)
+        print(json.dumps({'snapshot': snapshot['time'], 'records': list(records)}, indent=4))
+
+
+if __name__ == '__main__':
+    main()